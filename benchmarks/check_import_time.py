@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+Import-time regression check. Imports the control path of the library in fresh
+interpreters and fails if it pulls in visualization or notebook packages, or if
+it takes longer than the budget:
+
+    python benchmarks/check_import_time.py --max-ms 250
+
+Exits with status 1 if any check fails.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..")
+
+# Statement -> packages it must not import.
+CHECKS = {
+    "import faultier": ["numpy", "plotly", "matplotlib", "IPython", "tqdm", "asyncio"],
+    "from faultier import main": ["numpy", "plotly", "matplotlib", "IPython", "tqdm"],
+    "import faultier.FaultierPool": ["numpy", "plotly", "matplotlib", "IPython", "tqdm"],
+    "import faultier; faultier.Faultier; faultier.find_faultiers": ["numpy", "plotly", "matplotlib", "IPython", "tqdm"],
+}
+
+PROGRAM = """
+import json, sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"elapsed": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+def measure(statement, runs):
+    timings = []
+    modules = None
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", PROGRAM.format(statement=statement)],
+                                check=True, capture_output=True, text=True, cwd=ROOT)
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        timings.append(report["elapsed"])
+        modules = report["modules"]
+    return min(timings), modules
+
+def main():
+    parser = argparse.ArgumentParser(description="Faultier import-time regression check")
+    parser.add_argument("--max-ms", type=float, default=250, help="Budget per statement in milliseconds")
+    parser.add_argument("--runs", type=int, default=5, help="Interpreter starts per statement, the fastest counts")
+    args = parser.parse_args()
+
+    failed = False
+    for statement, forbidden in CHECKS.items():
+        elapsed, modules = measure(statement, args.runs)
+        loaded = sorted({module.split(".")[0] for module in modules} & set(forbidden))
+        problems = []
+        if loaded:
+            problems.append(f"imports {', '.join(loaded)}")
+        if elapsed * 1e3 > args.max_ms:
+            problems.append(f"over budget of {args.max_ms:.0f} ms")
+        failed = failed or bool(problems)
+        status = "FAIL: " + "; ".join(problems) if problems else "ok"
+        print(f"{statement:60} {elapsed * 1e3:8.1f} ms  {status}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+"""
+Compares glitch parameter search strategies on a simulated fault landscape,
+see faultier.SearchSimulator:
+
+    python benchmarks/compare_strategies.py --successes 10 --seeds 20
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+
+from faultier.SearchSimulator import *
+
+STRATEGIES = {
+    "random": RandomOrderStrategy,
+    "grid": GridStrategy,
+    "coarse-to-fine": CoarseToFineStrategy,
+    "adaptive": AdaptiveStrategy,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare glitch parameter search strategies")
+    parser.add_argument("--delay-range", type=int, nargs=2, default=[1000, 5000], help="Delays to search, end is exclusive")
+    parser.add_argument("--pulse-range", type=int, nargs=2, default=[1, 50], help="Pulses to search, end is exclusive")
+    parser.add_argument("--bands", type=int, default=2, help="Number of success bands")
+    parser.add_argument("--rate", type=float, default=0.2, help="Success probability in the center of a band")
+    parser.add_argument("--jitter", type=float, default=5, help="Trigger jitter in delay units")
+    parser.add_argument("--landscape-seed", type=int, default=1, help="Seed for the band positions")
+    parser.add_argument("--successes", type=int, default=10, help="Number of successes to find")
+    parser.add_argument("--max-attempts", type=int, default=100000, help="Glitch budget per run")
+    parser.add_argument("--seeds", type=int, default=10, help="Number of runs per strategy")
+    parser.add_argument("--only", nargs="+", choices=sorted(STRATEGIES), help="Only run these strategies")
+    args = parser.parse_args()
+
+    landscape = FaultLandscape.bands(tuple(args.delay_range), tuple(args.pulse_range), count=args.bands,
+                                     rate=args.rate, jitter=args.jitter, seed=args.landscape_seed)
+    strategies = {name: STRATEGIES[name] for name in args.only or STRATEGIES}
+    compare_strategies(strategies, landscape, args.successes, args.max_attempts, range(args.seeds))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+"""
+Throughput benchmarks for the faultier host library.
+
+Everything runs against the FaultierEmulator, so no hardware is needed. The
+results are written as JSON (to stdout unless --output is given) so that runs
+of different versions can be compared:
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --compare old.json new.json
+
+Individual benchmarks can be selected with --only, i.e. --only glitch read_adc.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from importlib import metadata
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+
+import faultier
+from faultier.FaultierEmulator import FaultierEmulator
+from faultier.GlitchDataCollection import GlitchDataCollection
+
+def measure(function, iterations):
+    """
+    Runs function iterations times and returns the elapsed seconds.
+    """
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return time.perf_counter() - start
+
+def bench_glitch(args):
+    with FaultierEmulator() as emulator:
+        f = faultier.Faultier(path=emulator.path)
+        f.glitch(100, 5)
+        elapsed = measure(lambda: f.glitch(100, 5), args.glitches)
+        unchanged = args.glitches / elapsed
+
+        params = [(100 + i, 5) for i in range(args.glitches)]
+        start = time.perf_counter()
+        for delay, pulse in params:
+            f.glitch(delay, pulse)
+        sweep = args.glitches / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for result in f.glitch_many(params, depth=8):
+            result.exception()
+        pipelined = args.glitches / (time.perf_counter() - start)
+        f.device.close()
+    return {
+        "glitch_unchanged_config": {"value": unchanged, "unit": "glitches/s"},
+        "glitch_sweep": {"value": sweep, "unit": "glitches/s"},
+        "glitch_many_sweep": {"value": pipelined, "unit": "glitches/s"},
+    }
+
+def bench_read_adc(args):
+    with FaultierEmulator() as emulator:
+        f = faultier.Faultier(path=emulator.path)
+        f.configure_adc(faultier.ADC_CROWBAR, 30000)
+        f.read_adc()
+        elapsed = measure(f.read_adc, args.adc_reads)
+        f.device.close()
+    return {
+        "read_adc_30000": {"value": args.adc_reads / elapsed, "unit": "reads/s"},
+        "read_adc_30000_samples": {"value": 30000 * args.adc_reads / elapsed, "unit": "samples/s"},
+    }
+
+def bench_config_roundtrip(args):
+    with FaultierEmulator() as emulator:
+        f = faultier.Faultier(path=emulator.path)
+        elapsed = measure(f._send_configuration, args.glitches)
+        f.device.close()
+    return {
+        "config_roundtrip": {"value": elapsed / args.glitches * 1e6, "unit": "us"},
+    }
+
+def _filled_collection(points):
+    gdc = GlitchDataCollection()
+    gdc.add_data("success", "Success", color="green")
+    gdc.add_data("reset", "Reset", color="red")
+    gdc.add_data("nothing", "Nothing")
+    keys = ["nothing"] * 8 + ["reset", "success"]
+    for i in range(points):
+        gdc.add(keys[i % 10], 1000 + i % 5000, 1 + i % 50)
+    return gdc
+
+def bench_gdc_add(args):
+    gdc = GlitchDataCollection()
+    gdc.add_data("success", "Success", color="green")
+    gdc.add_data("nothing", "Nothing")
+    start = time.perf_counter()
+    for i in range(args.points):
+        gdc.add("success" if i % 100 == 0 else "nothing", 1000 + i % 5000, 1 + i % 50)
+    elapsed = time.perf_counter() - start
+    return {
+        "gdc_add": {"value": elapsed / args.points * 1e9, "unit": "ns/point"},
+    }
+
+def bench_live_marker_plot(args):
+    try:
+        from faultier.LivePlot import LiveMarkerPlot
+        gdc = _filled_collection(args.points)
+        plot = LiveMarkerPlot(gdc)
+    except ImportError as e:
+        # FigureWidget needs the notebook widget stack.
+        return {"live_marker_plot_update": {"skipped": str(e)}}
+    start = time.perf_counter()
+    plot.update()
+    full = time.perf_counter() - start
+    # Updates are incremental, so every timed update gets a fresh batch of new,
+    # distinct points, as during a campaign.
+    batch = max(args.points // 1000, 1)
+    elapsed = 0
+    for repetition in range(3):
+        for i in range(batch):
+            gdc.add("success" if i % 10 == 0 else "nothing", 10000 + repetition * batch + i, 1 + i % 50)
+        start = time.perf_counter()
+        plot.update()
+        elapsed += time.perf_counter() - start
+    return {
+        "live_marker_plot_full_update": {"value": full * 1e3, "unit": "ms"},
+        "live_marker_plot_update": {"value": elapsed / 3 * 1e3, "unit": "ms/update"},
+    }
+
+def bench_import(args):
+    timings = []
+    for _ in range(args.import_runs):
+        result = subprocess.run([sys.executable, "-c", "import time; t = time.perf_counter(); import faultier; print(time.perf_counter() - t)"],
+                                check=True, capture_output=True, text=True, cwd=os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return {
+        "import_faultier": {"value": min(timings) * 1e3, "unit": "ms"},
+    }
+
+BENCHMARKS = {
+    "glitch": bench_glitch,
+    "read_adc": bench_read_adc,
+    "config_roundtrip": bench_config_roundtrip,
+    "gdc_add": bench_gdc_add,
+    "live_marker_plot": bench_live_marker_plot,
+    "import": bench_import,
+}
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)["results"]
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+    for name in sorted(set(old) & set(new)):
+        if "value" not in old[name] or "value" not in new[name]:
+            continue
+        change = (new[name]["value"] - old[name]["value"]) / old[name]["value"] * 100
+        print(f"{name:32} {old[name]['value']:14.2f} -> {new[name]['value']:14.2f} {new[name]['unit']:12} ({change:+.1f}%)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Faultier host library benchmarks")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Only run these benchmarks")
+    parser.add_argument("--glitches", type=int, default=5000, help="Number of glitches per glitch benchmark")
+    parser.add_argument("--adc-reads", type=int, default=200, help="Number of read_adc calls")
+    parser.add_argument("--points", type=int, default=1000000, help="Number of points for the data collection benchmarks")
+    parser.add_argument("--import-runs", type=int, default=5, help="Number of interpreter starts for the import benchmark")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = {}
+    for name in args.only or BENCHMARKS:
+        print(f"Running {name}...", file=sys.stderr)
+        # Keep stdout for the report, i.e. LiveMarkerPlot displays its figure.
+        with contextlib.redirect_stdout(sys.stderr):
+            results.update(BENCHMARKS[name](args))
+
+    try:
+        version = metadata.version("faultier")
+    except metadata.PackageNotFoundError:
+        version = None
+    report = {
+        "faultier": version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "parameters": {"glitches": args.glitches, "adc_reads": args.adc_reads, "points": args.points},
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
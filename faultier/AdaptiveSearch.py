@@ -0,0 +1,138 @@
+import numpy as np
+from .GlitchHeatmap import GlitchHeatmap
+
+"""
+    Proposes glitch parameters based on the outcomes seen so far. The delay x
+    pulse plane is divided into cells (like GlitchHeatmap) and every cell is a
+    bandit arm: Thompson sampling draws a success rate for every cell from its
+    Beta posterior and glitches in the cell with the highest draw. Cells that
+    produce successes are sampled more often, while cells with few attempts
+    still get explored.
+"""
+
+FAILURE = 0
+SUCCESS = 1
+
+class AdaptiveSearch:
+    """
+    Example::
+
+        search = AdaptiveSearch((1000, 5000), (1, 50), success_keys=["success"])
+        for i in range(10000):
+            delay, pulse = search.propose()
+            f.glitch(delay, pulse)
+            key = "success" if f.swd_check() else "nothing"
+            gdc.add(key, delay, pulse)
+            search.observe(key, delay, pulse)
+
+    Instead of observe(), update_from(gdc) can be called to pick up all points
+    added to a GlitchDataCollection since the last call.
+
+    :param delay_range: (start, end) of the delays to search, end is exclusive.
+
+    :param pulse_range: (start, end) of the pulses to search, end is exclusive.
+
+    :param success_keys: The GlitchDataCollection category keys that count as success.
+
+    :param delay_bins: Number of cells along the delay axis.
+
+    :param pulse_bins: Number of cells along the pulse axis.
+
+    :param exploration: Exploration vs. exploitation. 1 is plain Thompson sampling, larger
+                        values widen the posteriors and explore more, smaller values
+                        concentrate on the best cells sooner. 0 is greedy.
+
+    :param prior: (successes, failures) pseudo-counts every cell starts with. The
+                  default assumes nothing; with rare successes, a prior like
+                  (0.1, 10) avoids spending many glitches on every cell first.
+
+    :param seed: Seed for the random proposals.
+    """
+    def __init__(self, delay_range, pulse_range, success_keys=("success",), delay_bins=32, pulse_bins=16,
+                 exploration=1.0, prior=(1, 1), seed=None):
+        if exploration < 0:
+            raise ValueError(f"Exploration must not be negative. Provided {exploration}.")
+        self.heatmap = GlitchHeatmap(delay_range, pulse_range, delay_bins, pulse_bins)
+        self.heatmap._ensure_categories(2)
+        self.success_keys = set(success_keys)
+        self.exploration = exploration
+        self.prior = prior
+        self.rng = np.random.default_rng(seed)
+        # Number of points of each collection that were already observed.
+        self._processed = {}
+
+    def _posterior(self):
+        successes = self.heatmap.counts[SUCCESS]
+        failures = self.heatmap.counts[FAILURE]
+        if self.exploration == 0:
+            return None, (successes + self.prior[0]) / (successes + failures + self.prior[0] + self.prior[1])
+        alpha = self.prior[0] + successes / self.exploration
+        beta = self.prior[1] + failures / self.exploration
+        return alpha, beta
+
+    def _choose_cells(self, count):
+        alpha, beta = self._posterior()
+        if alpha is None:
+            # Greedy: highest posterior mean, ties broken randomly.
+            mean = beta.ravel()
+            best = np.flatnonzero(mean == mean.max())
+            return self.rng.choice(best, size=count)
+        draws = self.rng.beta(alpha.ravel(), beta.ravel(), size=(count, alpha.size))
+        return draws.argmax(axis=1)
+
+    def _point_in(self, cell):
+        delay_bin, pulse_bin = divmod(int(cell), self.heatmap.pulse_bins)
+        delay_start, delay_end, pulse_start, pulse_end = self.heatmap.cell_bounds(delay_bin, pulse_bin)
+        return int(self.rng.integers(delay_start, delay_end)), int(self.rng.integers(pulse_start, pulse_end))
+
+    def propose(self):
+        """
+        Returns the (delay, pulse) to glitch with next.
+        """
+        return self._point_in(self._choose_cells(1)[0])
+
+    def propose_many(self, count):
+        """
+        Returns a list of count (delay, pulse) proposals from independent draws, i.e.
+        for Faultier.glitch_many. Outcomes are only taken into account from the next call.
+        """
+        return [self._point_in(cell) for cell in self._choose_cells(count)]
+
+    def observe(self, key, delay, pulse):
+        """
+        Records the outcome of a glitch, key is the GlitchDataCollection category.
+        """
+        self.heatmap.add(SUCCESS if key in self.success_keys else FAILURE, delay, pulse)
+
+    def update_from(self, gdc):
+        """
+        Records all points added to gdc since the last call.
+        """
+        start = self._processed.get(id(gdc), 0)
+        delays, pulses, codes = gdc.rows(start)
+        self._processed[id(gdc)] = start + len(codes)
+        success = np.isin(codes, gdc._codes_for(self.success_keys))
+        self.heatmap.add_points(np.where(success, SUCCESS, FAILURE), delays, pulses)
+
+    @property
+    def attempts(self):
+        return int(self.heatmap.counts.sum())
+
+    @property
+    def successes(self):
+        return int(self.heatmap.counts[SUCCESS].sum())
+
+    def best_cells(self, count=5):
+        """
+        Returns the count cells with the highest posterior mean success rate as
+        list of ((delay_start, delay_end, pulse_start, pulse_end), rate, attempts).
+        """
+        successes = self.heatmap.counts[SUCCESS]
+        total = successes + self.heatmap.counts[FAILURE]
+        mean = (successes + self.prior[0]) / (total + self.prior[0] + self.prior[1])
+        cells = np.argsort(mean, axis=None)[::-1][:count]
+        result = []
+        for cell in cells:
+            delay_bin, pulse_bin = np.unravel_index(cell, mean.shape)
+            result.append((self.heatmap.cell_bounds(int(delay_bin), int(pulse_bin)), float(mean[delay_bin, pulse_bin]), int(total[delay_bin, pulse_bin])))
+        return result
@@ -0,0 +1,272 @@
+import asyncio
+import collections
+import struct
+from .faultier_pb2 import *
+from .Faultier import Faultier, ConfigurationRejected, find_faultier, scale_adc_samples, _copy_adc_samples
+from .FaultierFraming import FRAME_HEADER, FRAME_HEADER_LENGTH, encode_frame
+
+"""
+    asyncio version of the Faultier class. It speaks the same protocol
+    on the control channel, but all functions that talk to the device are
+    coroutines, so a single event loop can drive multiple Faultiers, their
+    UART bridges and any other equipment at the same time.
+
+    Requires pyserial-asyncio (pip3 install pyserial-asyncio) when opening
+    a serial port via AsyncFaultier.open().
+"""
+class AsyncFaultier:
+    """
+    Use `await AsyncFaultier.open(path)` to connect to a Faultier. The constructor
+    itself takes an already connected asyncio StreamReader/StreamWriter pair.
+
+    Commands can be issued concurrently (i.e. via asyncio.gather), they are
+    sent in order and their responses are matched in order.
+
+    :param timeout: Seconds to wait for a response before raising asyncio.TimeoutError.
+    """
+
+    VID = Faultier.VID
+    PID = Faultier.PID
+    _uart_path = None
+
+    def __init__(self, reader, writer, timeout = 5):
+        self.reader = reader
+        self.writer = writer
+        self.timeout = timeout
+
+        # Entries are (future, handler, final), see Faultier._pending.
+        self._pending = collections.deque()
+        self._read_task = asyncio.get_running_loop().create_task(self._read_loop())
+
+        self._device_configuration = None
+        self._configuration_frames = {}
+        self._glitch_frame = encode_frame(Command(glitch=CommandGlitch()).SerializeToString())
+        self._read_adc_frame = encode_frame(Command(read_adc=CommandReadADC()).SerializeToString())
+        self._swd_check_frame = encode_frame(Command(swd_check=CommandSWDCheck(function = SWD_CHECK_ENABLED)).SerializeToString())
+        self._nrf52_check_frame = encode_frame(Command(swd_check=CommandSWDCheck(function = SWD_CHECK_NRF52)).SerializeToString())
+        self._command = Command()
+        self._response = Response()
+        self.config_uploads = 0
+        self.config_uploads_skipped = 0
+
+        self.default_settings()
+
+    @classmethod
+    async def open(cls, path = None, timeout = 5, serial_number = None):
+        """
+        Opens the control channel of a Faultier and checks the protocol version.
+
+        :param path: The path to the serial device, see Faultier. Auto-detected if None.
+
+        :param serial_number: Open the Faultier with this USB serial number instead, see find_faultiers().
+        """
+        try:
+            import serial_asyncio
+        except ImportError:
+            raise ImportError("AsyncFaultier requires pyserial-asyncio - install it with pip3 install pyserial-asyncio")
+        uart_path = None
+        if serial_number is not None:
+            device = find_faultier(serial_number)
+            path = device.control
+            uart_path = device.uart
+        if not path:
+            path = cls.__new__(cls)._find_serial_port()
+            if not path:
+                raise Exception("No suitable serial port found.")
+        reader, writer = await serial_asyncio.open_serial_connection(url = path)
+        faultier = cls(reader, writer, timeout = timeout)
+        faultier._uart_path = uart_path
+        try:
+            await faultier.hello()
+        except:
+            await faultier.close()
+            raise
+        return faultier
+
+    async def close(self):
+        """
+        Closes the connection. Outstanding commands fail with a ConnectionError.
+        """
+        self._read_task.cancel()
+        try:
+            await self._read_task
+        except asyncio.CancelledError:
+            pass
+        self._fail_pending(ConnectionError("Connection closed."))
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except Exception:
+            pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    # Device discovery and the local glitcher configuration work exactly as
+    # in the blocking implementation.
+    _find_serial_port = Faultier._find_serial_port
+    _find_serial_port_windows = Faultier._find_serial_port_windows
+    _find_serial_port_macos = Faultier._find_serial_port_macos
+    _find_serial_port_linux = Faultier._find_serial_port_linux
+    get_serial_path = Faultier.get_serial_path
+    _get_default_settings = Faultier._get_default_settings
+    default_settings = Faultier.default_settings
+    configure_glitcher = Faultier.configure_glitcher
+    configuration_dirty = Faultier.configuration_dirty
+    _configuration_frame = Faultier._configuration_frame
+    # Same goes for parsing the responses.
+    _parse_response = Faultier._parse_response
+    _parse_ok = Faultier._parse_ok
+    _handle_configuration_response = Faultier._handle_configuration_response
+    _rejected_glitches = Faultier._rejected_glitches
+    _handle_glitch_response = Faultier._handle_glitch_response
+    _handle_swd_check_response = Faultier._handle_swd_check_response
+    _handle_nrf52_check_response = Faultier._handle_nrf52_check_response
+    _handle_read_adc_response = Faultier._handle_read_adc_response
+
+    async def _read_loop(self):
+        try:
+            while True:
+                header = await self.reader.readexactly(FRAME_HEADER_LENGTH)
+                if header[0:4] != FRAME_HEADER:
+                    raise ValueError(f"Invalid header received: {header}")
+                length = struct.unpack_from("<I", header, 4)[0]
+                data = await self.reader.readexactly(length)
+                if not self._pending:
+                    raise ValueError("Received a response without a pending command.")
+                future, handler, final = self._pending.popleft()
+                try:
+                    result = handler(data)
+                except ValueError as e:
+                    if not future.done():
+                        future.set_exception(e)
+                    if isinstance(e, ConfigurationRejected):
+                        for queued in self._rejected_glitches():
+                            if not queued.done():
+                                queued.set_exception(e)
+                    continue
+                if final and not future.done():
+                    future.set_result(result)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # The stream is out of sync or closed, fail everything that is outstanding.
+            self._device_configuration = None
+            self._fail_pending(e)
+
+    def _fail_pending(self, exception):
+        while self._pending:
+            future, _, _ = self._pending.popleft()
+            if not future.done():
+                future.set_exception(exception)
+
+    def _send(self, frames, handlers):
+        """
+        Writes frames in one go and registers one handler per frame. Returns the
+        future that resolves with the result of the last handler.
+        """
+        if self._read_task.done():
+            raise ConnectionError("Connection to the Faultier is closed.")
+        future = asyncio.get_running_loop().create_future()
+        # Responses to timed out requests are never awaited, don't warn about them.
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.writer.write(b"".join(frames) if len(frames) > 1 else frames[0])
+        for i, handler in enumerate(handlers):
+            self._pending.append((future, handler, i == len(handlers) - 1))
+        return future
+
+    async def _request(self, frames, handlers):
+        future = self._send(frames, handlers)
+        await self.writer.drain()
+        # shield() keeps the future registered on timeout, the late response
+        # will still be matched to it so later commands stay in sync.
+        return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+
+    async def hello(self):
+        """
+        Checks that the Faultier speaks the same protocol version as this library.
+        """
+        cmd = Command()
+        cmd.hello.CopyFrom(CommandHello())
+        version = await self._request([encode_frame(cmd.SerializeToString())], [lambda data: self._parse_response(data).hello.version])
+        if version != FAULTIER_VERSION:
+            raise ValueError(f"Invalid Faultier version: Locally: {FAULTIER_VERSION} - Device: {version}")
+
+    async def configure_adc(self, source, sample_count):
+        """
+        Configures the ADC of the Faultier, see Faultier.configure_adc.
+        """
+        if sample_count > 30000:
+            raise ValueError(f"Sample count must be under 30000. Provided {sample_count}.")
+        cmd = Command()
+        cmd.configure_adc.CopyFrom(CommandConfigureADC(source = source, sample_count = sample_count))
+        await self._request([encode_frame(cmd.SerializeToString())], [self._parse_ok])
+
+    def _glitch_request(self, config):
+        serialized = config.SerializeToString()
+        if serialized == self._device_configuration:
+            self.config_uploads_skipped += 1
+            return self._request([self._glitch_frame], [self._handle_glitch_response])
+        self.config_uploads += 1
+        self._device_configuration = serialized
+        return self._request([self._configuration_frame(serialized), self._glitch_frame],
+                             [self._handle_configuration_response, self._handle_glitch_response])
+
+    async def glitch(self, delay = None, pulse = None):
+        """
+        Perform a glitch, see Faultier.glitch.
+
+        :param delay: Delay between trigger and glitch
+
+        :param pulse: Pulse length for the glitch
+        """
+        if delay != None:
+            self.glitcher_configuration.delay = delay
+        if pulse != None:
+            self.glitcher_configuration.pulse = pulse
+        await self._glitch_request(self.glitcher_configuration)
+
+    async def power_cycle(self):
+        """
+        Power-cycles the target, see Faultier.power_cycle.
+        """
+        config = self._get_default_settings()
+        config.power_cycle_output = self.glitcher_configuration.power_cycle_output
+        config.power_cycle_length = self.glitcher_configuration.power_cycle_length
+        await self._glitch_request(config)
+
+    async def read_adc(self, scaled = False):
+        """
+        Receives the current ADC sample-buffer from the device as numpy.uint8
+        array, see Faultier.read_adc.
+
+        :param scaled: Return floats between 0 and 1 instead of the raw samples.
+        """
+        samples = await self._request([self._read_adc_frame], [self._handle_read_adc_response])
+        if scaled:
+            return scale_adc_samples(samples)
+        return samples
+
+    async def read_adc_into(self, out):
+        """
+        Receives the current ADC sample-buffer into a preallocated buffer and
+        returns the number of samples written, see Faultier.read_adc_into.
+        """
+        samples = await self._request([self._read_adc_frame], [self._handle_read_adc_response])
+        return _copy_adc_samples(samples, out)
+
+    async def swd_check(self):
+        """
+        Checks whether an SWD device can be found, see Faultier.swd_check.
+        """
+        return await self._request([self._swd_check_frame], [self._handle_swd_check_response])
+
+    async def nrf52_check(self):
+        """
+        nRF52 specific check to see whether APPROTECT is disabled/flash can be read.
+        """
+        return await self._request([self._nrf52_check_frame], [self._handle_nrf52_check_response])
+
@@ -0,0 +1,129 @@
+import collections
+import threading
+import time
+
+"""
+    Moves the bookkeeping and redrawing of live plots out of the glitch loop.
+    The loop only appends its results to a queue, a background thread adds
+    them to the GlitchDataCollection and refreshes the figures on its own
+    schedule.
+"""
+class BackgroundPlotter:
+    """
+    Example::
+
+        plot = LiveMarkerPlot(gdc)
+        with BackgroundPlotter(gdc, marker_plot=plot) as plotter:
+            for delay, pulse in params:
+                f.glitch(delay, pulse)
+                plotter.add("success" if f.swd_check() else "nothing", delay, pulse)
+
+    While the plotter runs, the background thread owns the collection: Only add
+    points through the plotter and read the collection after stop(). Pending
+    points are added on stop().
+
+    Only the most recent trace passed to trace() is drawn, traces that arrive
+    faster than the interval are dropped.
+
+    If refreshing fails, the background thread stops and the error is raised
+    from stop(), after the pending points were added.
+
+    The figures are still rendered by the notebook frontend. Most of the work in
+    the background thread happens while the glitch loop waits for the Faultier,
+    which releases the GIL.
+
+    :param gdc: The GlitchDataCollection to add the points to, or None if only traces are plotted.
+
+    :param marker_plot: A LiveMarkerPlot to update, or None.
+
+    :param live_plot: A LivePlot to update with the traces, or None.
+
+    :param interval: Seconds between two refreshes of the figures.
+    """
+    def __init__(self, gdc=None, marker_plot=None, live_plot=None, interval=0.5):
+        self.gdc = gdc
+        self.marker_plot = marker_plot
+        self.live_plot = live_plot
+        self.interval = interval
+        # deque.append and popleft are atomic, so the glitch loop never waits for a lock.
+        self._points = collections.deque()
+        # One-slot queue: appending replaces the trace that was not drawn yet.
+        self._traces = collections.deque(maxlen=1)
+        self._thread = None
+        self._stop = threading.Event()
+        self.error = None
+
+    def add(self, key, delay, pulse):
+        """
+        Queues a point for GlitchDataCollection.add(key, delay, pulse).
+        """
+        self._points.append((key, delay, pulse))
+
+    def trace(self, data):
+        """
+        Queues an ADC trace for the live plot, replacing any trace that was not drawn yet.
+        """
+        self._traces.append(data)
+
+    def start(self):
+        """
+        Starts the background thread.
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="BackgroundPlotter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the background thread, adds all pending points and redraws once more.
+        Raises the error that stopped the background thread, if any.
+        """
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        if self.error is not None:
+            self._drain()
+            error, self.error = self.error, None
+            raise error
+        self._refresh()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _drain(self):
+        points = self._points
+        add = self.gdc.add if self.gdc is not None else None
+        while points:
+            key, delay, pulse = points.popleft()
+            if add is not None:
+                add(key, delay, pulse)
+
+    def _refresh(self):
+        self._drain()
+        if self.marker_plot is not None:
+            self.marker_plot.update()
+        if self.live_plot is not None:
+            try:
+                trace = self._traces.popleft()
+            except IndexError:
+                return
+            self.live_plot.update(trace, force=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.time()
+            try:
+                self._refresh()
+            except Exception as e:
+                # Plotting must never take down the glitch loop, the error is raised from stop().
+                self.error = e
+                return
+            self._stop.wait(max(self.interval - (time.time() - started), 0))
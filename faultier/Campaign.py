@@ -0,0 +1,291 @@
+import json
+import os
+import re
+import time
+import serial
+from . import faultier_pb2
+from .Faultier import Faultier, TriggerTimeout
+# Classes that share the name of their module are imported through the package,
+# importing the module directly would shadow the class on it, see __init__.py.
+from . import GlitchDataCollection, ParameterSampler, SequentialTester
+
+"""
+    Headless glitch campaigns, described by a configuration file and run with
+    `faultier campaign <config>`. Results go into a GlitchDataCollection log,
+    progress is checkpointed, and running the same command again resumes an
+    interrupted campaign.
+
+    Example configuration (JSON, or TOML with Python 3.11+)::
+
+        {
+            "device": {"serial_number": null, "path": null},
+            "glitcher": {
+                "trigger_type": "TRIGGER_RISING_EDGE",
+                "trigger_source": "TRIGGER_IN_EXT0",
+                "glitch_output": "OUT_CROWBAR",
+                "power_cycle_output": "OUT_EXT0",
+                "power_cycle_length": 3000
+            },
+            "adc": {"source": "ADC_CROWBAR", "sample_count": 1000, "traces": "traces.bin"},
+            "parameters": {"delay": [1000, 5000], "pulse": [1, 50, 1]},
+            "seed": 1,
+            "repeats": 1,
+            "early_stopping": {"threshold": 0.05, "max_attempts": 50, "method": "sprt"},
+            "check": {"type": "uart", "pattern": "flag\\\\{", "baudrate": 115200, "timeout": 0.2},
+            "output": "campaign.gdc",
+            "report_interval": 10
+        }
+
+    parameters maps glitcher settings to [start, end] or [start, end, step] ranges
+    (end exclusive) or to {"values": [...]} for explicit values, i.e.
+    {"values": ["TRIGGER_RISING_EDGE", "TRIGGER_FALLING_EDGE"]}. delay and pulse are required, other keys
+    (i.e. power_cycle_length or trigger_type) are set with configure_glitcher.
+    check.type is one of swd, nrf52, uart or none. early_stopping replaces repeats
+    with a SequentialTester. adc and its traces archive are optional.
+"""
+
+SUCCESS = "success"
+NOTHING = "nothing"
+ERROR = "error"
+
+def load_config(path):
+    """
+    Reads a campaign configuration from a JSON or TOML file.
+    """
+    if path.endswith(".toml"):
+        try:
+            import tomllib
+        except ImportError:
+            raise ImportError("TOML configurations require Python 3.11 or newer, use JSON instead.")
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    with open(path) as f:
+        return json.load(f)
+
+def _constant(value):
+    # Protocol constants can be given by name, i.e. "TRIGGER_RISING_EDGE".
+    if isinstance(value, str):
+        if not hasattr(faultier_pb2, value):
+            raise ValueError(f"Unknown constant {value}.")
+        return getattr(faultier_pb2, value)
+    return value
+
+def _dimension(value):
+    if isinstance(value, list) and len(value) in (2, 3) and all(isinstance(v, int) for v in value):
+        return range(*value)
+    if isinstance(value, dict) and "values" in value:
+        value = value["values"]
+    if isinstance(value, list):
+        return [_constant(v) for v in value]
+    raise ValueError(f"Invalid parameter range {value}, use [start, end], [start, end, step] or a list of values.")
+
+class Campaign:
+    """
+    :param config: The configuration as dict, see load_config.
+
+    :param base_path: Directory relative output paths are resolved against.
+    """
+    def __init__(self, config, base_path="."):
+        self.config = config
+        parameters = config.get("parameters", {})
+        if "delay" not in parameters or "pulse" not in parameters:
+            raise ValueError("Parameters delay and pulse are required.")
+        self.dimensions = {name: _dimension(value) for name, value in parameters.items()}
+        self.output = os.path.join(base_path, config.get("output", "campaign.gdc"))
+        self.checkpoint_path = os.path.join(base_path, config.get("checkpoint", self.output + ".checkpoint"))
+        self.report_interval = config.get("report_interval", 10)
+        self.checkpoint_interval = config.get("checkpoint_interval", 10)
+        self.repeats = config.get("repeats", 1)
+        self.tester = None
+        if "early_stopping" in config:
+            self.tester = SequentialTester(**config["early_stopping"])
+        self.check = config.get("check", {"type": "swd"})
+        if self.check.get("type") not in ("swd", "nrf52", "uart", "none"):
+            raise ValueError(f"Unknown check type {self.check.get('type')}, use swd, nrf52, uart or none.")
+        self.faultier = None
+        self.uart = None
+        self.traces = None
+        self.glitches = 0
+        self._start_glitches = 0
+        # Points in the log when the last parameter point was completed, and in the checkpoint.
+        self._completed_points = 0
+        self._completed_glitches = 0
+        self._completed_traces = 0
+        # The checkpoint resumed from, None for a new campaign.
+        self._checkpoint = None
+
+    @staticmethod
+    def load(path):
+        """
+        Creates a campaign from a configuration file. Relative paths in it are relative to the file.
+        """
+        return Campaign(load_config(path), base_path=os.path.dirname(os.path.abspath(path)))
+
+    def _sampler(self, resume):
+        if resume and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                checkpoint = json.load(f)
+            sampler = ParameterSampler.from_state(checkpoint["sampler"])
+            if checkpoint["sampler"]["dimensions"] != ParameterSampler(self.dimensions).get_state()["dimensions"]:
+                raise ValueError(f"Checkpoint {self.checkpoint_path} belongs to different parameters, "
+                                 "use a different output to start a new campaign.")
+            self.glitches = checkpoint["glitches"]
+            self._checkpoint = checkpoint
+            print(f"Resuming at point {sampler.current_x} of {len(sampler)}.")
+            return sampler
+        if resume and os.path.exists(self.output):
+            # Without a checkpoint it is unknown which points the log covers.
+            raise ValueError(f"{self.output} exists, but there is no checkpoint {self.checkpoint_path} to resume from. "
+                             "Use a different output to start a new campaign.")
+        return ParameterSampler(self.dimensions, seed=self.config.get("seed"))
+
+    def _write_checkpoint(self, sampler):
+        # The log is flushed first, so the checkpoint never points past the stored results.
+        # It records how many points of the log belong to completed parameter points; on
+        # resume, the log is cut back to that, as everything after it is repeated.
+        self.gdc.flush()
+        checkpoint = {"sampler": sampler.get_state(), "glitches": self._completed_glitches, "points": self._completed_points}
+        if self.traces is not None:
+            self.traces.flush()
+            checkpoint["traces"] = self._completed_traces
+        temporary = self.checkpoint_path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(temporary, self.checkpoint_path)
+
+    def _open(self, resume):
+        if not resume and os.path.exists(self.output):
+            raise ValueError(f"{self.output} already exists, remove it or resume the campaign.")
+        device = self.config.get("device", {})
+        self.faultier = Faultier(path=device.get("path"), serial_number=device.get("serial_number"))
+        glitcher = {key: _constant(value) for key, value in self.config.get("glitcher", {}).items()}
+        self.faultier.configure_glitcher(**glitcher)
+        adc = self.config.get("adc")
+        if adc:
+            self.faultier.configure_adc(_constant(adc.get("source", "ADC_CROWBAR")), adc.get("sample_count", 1000))
+            if adc.get("traces"):
+                from . import TraceArchive
+                path = os.path.join(os.path.dirname(self.output), adc["traces"])
+                if self._checkpoint is None and os.path.exists(path):
+                    raise ValueError(f"{path} already exists, use a different traces file to start a new campaign.")
+                self.traces = TraceArchive(path, sample_count=adc.get("sample_count", 1000))
+                if self._checkpoint is not None and "traces" in self._checkpoint:
+                    # Like the log, go back to the traces of the completed points.
+                    self.traces.truncate(self._checkpoint["traces"])
+                self._completed_traces = len(self.traces)
+        if self.check["type"] == "uart":
+            # A short timeout, so _uart_match waits for data instead of spinning.
+            self.uart = serial.Serial(self.check.get("port") or self.faultier.get_serial_path(),
+                                      self.check.get("baudrate", 115200), timeout=0.01)
+            self.pattern = re.compile(self.check["pattern"].encode("utf-8"))
+
+        self.gdc = GlitchDataCollection()
+        self.gdc.open_log(self.output, batch_size=self.config.get("batch_size", 256), fsync=self.config.get("fsync", True),
+                          max_points=self._checkpoint.get("points") if self._checkpoint else None)
+        self._completed_points = len(self.gdc)
+        self._completed_glitches = self.glitches
+        for key, name in ((SUCCESS, "Success"), (NOTHING, "Nothing"), (ERROR, "Error")):
+            if key not in self.gdc.data:
+                self.gdc.add_data(key, name)
+
+    def _close(self):
+        if self.gdc is not None:
+            self.gdc.close_log()
+        if self.traces is not None:
+            self.traces.close()
+        if self.uart is not None:
+            self.uart.close()
+        if self.faultier is not None:
+            self.faultier.device.close()
+
+    def attempt(self, delay, pulse):
+        """
+        Glitches once with the current configuration and returns the outcome key.
+        """
+        if self.uart is not None:
+            self.uart.reset_input_buffer()
+        self.glitches += 1
+        try:
+            self.faultier.glitch(delay, pulse)
+        except TriggerTimeout:
+            return ERROR
+        check = self.check["type"]
+        if check == "swd":
+            key = SUCCESS if self.faultier.swd_check() else NOTHING
+        elif check == "nrf52":
+            key = SUCCESS if self.faultier.nrf52_check() else NOTHING
+        elif check == "uart":
+            key = SUCCESS if self._uart_match() else NOTHING
+        else:
+            key = NOTHING
+        if self.traces is not None:
+            self.traces.append(self.faultier.read_adc(), delay, pulse, key)
+        return key
+
+    def _uart_match(self):
+        data = b""
+        deadline = time.time() + self.check.get("timeout", 0.1)
+        while time.time() < deadline:
+            data += self.uart.read(self.uart.in_waiting or 1)
+            if self.pattern.search(data):
+                return True
+        return False
+
+    def run(self, resume=True, limit=None):
+        """
+        Runs the campaign until all parameter combinations are done, limit glitches
+        were performed or it is interrupted with Ctrl-C. Returns the collection.
+
+        :param resume: Continue from the checkpoint and log of an earlier run.
+        """
+        sampler = self._sampler(resume)
+        self.gdc = None
+        names = sampler.names
+        try:
+            self._open(resume)
+            self._start_glitches = self.glitches
+            start = time.time()
+            last_report = start
+            last_checkpoint = start
+            while sampler.current_x < len(sampler):
+                if limit is not None and self.glitches >= limit:
+                    break
+                values = dict(zip(names, sampler.value_at(sampler.current_x)))
+                delay = values.pop("delay")
+                pulse = values.pop("pulse")
+                if values:
+                    self.faultier.configure_glitcher(**values)
+                if self.tester is not None:
+                    self.tester.run(lambda: self.attempt(delay, pulse), delay, pulse, gdc=self.gdc, success_keys=(SUCCESS,))
+                else:
+                    for _ in range(self.repeats):
+                        self.gdc.add(self.attempt(delay, pulse), delay, pulse)
+                # Only counted as done once all attempts of the point are recorded.
+                sampler.current_x += 1
+                self._completed_points = len(self.gdc)
+                self._completed_glitches = self.glitches
+                if self.traces is not None:
+                    self._completed_traces = len(self.traces)
+
+                now = time.time()
+                if now - last_checkpoint >= self.checkpoint_interval:
+                    self._write_checkpoint(sampler)
+                    last_checkpoint = now
+                if now - last_report >= self.report_interval:
+                    self._report(sampler, now - start)
+                    last_report = now
+        except KeyboardInterrupt:
+            print("Interrupted, run the same command again to resume.")
+        finally:
+            if self.gdc is not None:
+                self._write_checkpoint(sampler)
+            self._close()
+        if sampler.current_x >= len(sampler):
+            print("Campaign complete.")
+        self._report(sampler, None)
+        return self.gdc
+
+    def _report(self, sampler, elapsed):
+        rate = f", {(self.glitches - self._start_glitches) / elapsed:.1f} glitches/s" if elapsed else ""
+        print(f"{sampler.current_x}/{len(sampler)} points, {self.glitches} glitches{rate}, "
+              f"{len(self.gdc.data[SUCCESS])} successes, {len(self.gdc.data[ERROR])} errors", flush=True)
@@ -3,12 +3,12 @@ import serial.tools.list_ports
 import platform
 import subprocess
 import sys
-import plotly.graph_objs as go
-from IPython.display import display
 from .faultier_pb2 import *
+from .FaultierFraming import IOStats, FrameReader, FrameWriter, encode_frame
 import struct
 import subprocess
 import os
+import collections
 
 # Get the directory of the current module
 MODULE_DIR = os.path.dirname(os.path.realpath(__file__))
@@ -18,6 +18,90 @@ def convert_uint8_samples(input: bytes):
     for b in input:
         r.append(b/255)
     return r
+
+def _copy_adc_samples(samples, out):
+    import numpy as np
+    count = len(samples)
+    target = np.frombuffer(out, dtype=np.uint8) if not isinstance(out, np.ndarray) else out
+    if len(target) < count:
+        raise ValueError(f"Buffer too small: {count} samples received, buffer holds {len(target)}.")
+    target[:count] = samples
+    return count
+
+def scale_adc_samples(samples):
+    """
+    Scales raw uint8 ADC samples (as returned by read_adc) to floats between 0 and 1.
+    """
+    import numpy as np
+    return np.asarray(samples, dtype=np.uint8) / 255
+
+class TriggerTimeout(ValueError):
+    """
+    Raised when a glitch timed out waiting for its trigger. A ValueError, like
+    the other errors reported by the Faultier.
+    """
+    pass
+
+class ConfigurationRejected(ValueError):
+    """
+    Raised when the Faultier rejected the glitcher configuration that was sent
+    ahead of a glitch. The glitch command is not held back until the
+    configuration is acknowledged, so the glitch still ran, with the previous
+    configuration; its result is discarded.
+    """
+    pass
+
+class ResponseFuture:
+    """
+    The pending result of a command that has been sent to the Faultier but
+    whose response has not been read yet. Returned by the pipelined API
+    (`glitch_submit`, `glitch_many` & co).
+
+    Responses are always read in the order the commands were sent, so waiting
+    on a future also reads (and stores) the responses of all commands that
+    were submitted before it.
+    """
+    def __init__(self, faultier, params=None):
+        self.params = params
+        self._faultier = faultier
+        self._done = False
+        self._result = None
+        self._exception = None
+
+    def done(self):
+        """
+        Whether the response for this command has already been read.
+        """
+        return self._done
+
+    def result(self):
+        """
+        Returns the result of the command, reading responses from the Faultier
+        until this one has arrived. Raises the error reported by the Faultier
+        (i.e. "Trigger timeout!") if there was one.
+        """
+        exception = self.exception()
+        if exception is not None:
+            raise exception
+        return self._result
+
+    def exception(self):
+        """
+        Like result(), but returns the error instead of raising it. Returns
+        None if the command succeeded.
+        """
+        while not self._done:
+            self._faultier._process_pending_response()
+        return self._exception
+
+    def _set_result(self, result):
+        self._result = result
+        self._done = True
+
+    def _set_exception(self, exception):
+        self._exception = exception
+        self._done = True
+
 """
     This class is used to control the Faultier.
 
@@ -28,21 +112,74 @@ def convert_uint8_samples(input: bytes):
     are marked as static and can be called without initializing
     the Faultier first.
 """
+FAULTIER_VID = 0x2b3e
+FAULTIER_PID = 0x2343
+
+FaultierDevice = collections.namedtuple("FaultierDevice", ["serial_number", "control", "uart"])
+
+def _interface_number(port):
+    # The location ends in ":<configuration>.<interface>" on Linux and Windows.
+    if port.location and ":" in port.location:
+        try:
+            return int(port.location.rsplit(".", 1)[-1])
+        except ValueError:
+            pass
+    return 0
+
+def find_faultiers():
+    """
+    Returns all attached Faultiers as list of FaultierDevice(serial_number, control, uart),
+    sorted by serial number. control is the path of the control channel, uart the
+    path of the UART bridge (None if it was not found).
+    """
+    groups = {}
+    for port in serial.tools.list_ports.comports():
+        if port.vid != FAULTIER_VID or port.pid != FAULTIER_PID:
+            continue
+        # Group the interfaces by USB device. Boards with the same serial number
+        # are told apart by the port they are plugged into.
+        location = port.location.split(":")[0] if port.location else None
+        groups.setdefault((port.serial_number, location), []).append(port)
+    devices = []
+    for (serial_number, location), ports in groups.items():
+        ports.sort(key=lambda port: (_interface_number(port), port.device))
+        devices.append(FaultierDevice(serial_number, ports[0].device, ports[1].device if len(ports) > 1 else None))
+    devices.sort(key=lambda device: (device.serial_number or "", device.control))
+    return devices
+
+def find_faultier(serial_number):
+    """
+    Returns the FaultierDevice with the given USB serial number.
+    """
+    for device in find_faultiers():
+        if device.serial_number == serial_number:
+            return device
+    raise Exception(f"No Faultier with serial number {serial_number} found.")
+
 class Faultier:
     """
     :param path: The path to the serial device. Note that the Faultier exposes
                  two serial devices - the first one is the control channel.
                  
                  On mac this will be /dev/cu.usbmodemfaultier1.
+
+    :param serial_number: Connect to the Faultier with this USB serial number
+                          instead, see find_faultiers().
     """
 
     VID = "2b3e"
     PID = "2343"
 
-    def __init__(self, path = None):
+    def __init__(self, path = None, serial_number = None):
         """
         """
-        if path:
+        # UART bridge of the same board, if known, see get_serial_path.
+        self._uart_path = None
+        if serial_number is not None:
+            device = find_faultier(serial_number)
+            self._uart_path = device.uart
+            self.device = serial.Serial(device.control)
+        elif path:
             self.device = serial.Serial(path)
         else:
             path = self._find_serial_port()
@@ -51,6 +188,32 @@ class Faultier:
             self.device = serial.Serial(path)
         self.device.timeout = 5
 
+        # Bytes and read/write calls spent on the control channel, see IOStats.
+        self.io_stats = IOStats()
+        self._writer = FrameWriter(self.device, self.io_stats)
+        self._reader = FrameReader(self.device, self.io_stats)
+        # Reused for every response/command instead of allocating new messages.
+        self._response = Response()
+        self._command = Command()
+
+        # Commands that have been sent but whose response has not been read
+        # yet, in the order they were sent. Entries are (future, handler, final).
+        self._pending = collections.deque()
+        self._non_blocking = collections.deque()
+
+        # The serialized glitcher configuration that is currently active on the
+        # Faultier, None if unknown. Used to skip re-uploading an unchanged
+        # configuration before every glitch.
+        self._device_configuration = None
+        # Ready-to-send configuration frames, keyed by serialized configuration.
+        self._configuration_frames = {}
+        self._glitch_frame = encode_frame(Command(glitch=CommandGlitch()).SerializeToString())
+        self._read_adc_frame = encode_frame(Command(read_adc=CommandReadADC()).SerializeToString())
+        self._swd_check_frame = encode_frame(Command(swd_check=CommandSWDCheck(function = SWD_CHECK_ENABLED)).SerializeToString())
+        self._nrf52_check_frame = encode_frame(Command(swd_check=CommandSWDCheck(function = SWD_CHECK_NRF52)).SerializeToString())
+        self.config_uploads = 0
+        self.config_uploads_skipped = 0
+
         # Send hello command to get protocol version from Faultier
         hello = CommandHello()
         cmd = Command()
@@ -69,6 +232,8 @@ class Faultier:
         and the second one is the UART bridge onto the 20-pin connector.
         This function returns the path to the second serial port.
         """
+        if self._uart_path:
+            return self._uart_path
         return self._find_serial_port(index=1)
 
     def _find_serial_port(self, index = 0):
@@ -102,6 +267,9 @@ class Faultier:
         return None
 
     def _find_serial_port_linux(self, index = 0):
+        devices = find_faultiers()
+        if devices:
+            return devices[0][1 + index] if index < 2 else None
         if(index == 0):
             return "/dev/serial/by-id/usb-stacksmashing_Faultier_faultier-if00"
         if(index == 1):
@@ -109,34 +277,84 @@ class Faultier:
         return None
 
     def _read_response(self):
-        header = self.device.read(4)
-        if(header != b"FLTR"):
-            print(header)
-            raise ValueError(f"Invalid header received: {header}")
-        length_data = self.device.read(4)
-        length = struct.unpack("<I", length_data)[0]
-        return self.device.read(length)
-
-    def _check_response(self):
-        response = self._read_response()
-        resp = Response()
-        resp.ParseFromString(response)
+        # Only valid until the next response is read.
+        return self._reader.read()
+
+    def _parse_response(self, data):
+        # Note that the returned message is reused for the next response, so
+        # callers need to pick out what they need right away.
+        resp = self._response
+        resp.ParseFromString(data)
         if resp.WhichOneof('type') == 'error':
             raise ValueError("Error: " + resp.error.message)
         if resp.WhichOneof('type') == 'trigger_timeout':
-            raise ValueError("Trigger timeout!")
+            raise TriggerTimeout("Trigger timeout!")
         return resp
 
-    def _check_ok(self):
-        response = self._read_response()
-        resp = Response()
-        resp.ParseFromString(response)
-        if resp.ok:
+    def _parse_ok(self, data):
+        resp = self._response
+        resp.ParseFromString(data)
+        if resp.WhichOneof('type') == 'ok':
             return
-        if resp.error:
+        if resp.WhichOneof('type') == 'error':
             raise ValueError("Error: " + resp.error.message)
         else:
-            raise ValueError("No OK or Error received.", resp)
+            raise ValueError("No OK or Error received.", resp.WhichOneof('type'))
+
+    def _check_response(self):
+        self._drain_pending()
+        return self._parse_response(self._read_response())
+
+    def _check_ok(self):
+        self._drain_pending()
+        self._parse_ok(self._read_response())
+
+    def _submit(self, protobufobj, handler, future, final=True):
+        """
+        Sends a command without waiting for its response. The response will be
+        passed to handler once it is read, and the handlers return value (or
+        exception) is stored in future. A future can span multiple commands,
+        in that case only the last one is marked as final.
+        """
+        self._send_protobuf(protobufobj)
+        self._pending.append((future, handler, final))
+
+    def _submit_frame(self, frame, handler, future):
+        self._writer.write_frames(frame)
+        self._pending.append((future, handler, True))
+
+    def _process_pending_response(self):
+        if not self._pending:
+            raise ValueError("No response pending.")
+        future, handler, final = self._pending.popleft()
+        try:
+            data = self._read_response()
+        except Exception as e:
+            # The stream is out of sync, none of the outstanding responses
+            # can be trusted anymore.
+            self._device_configuration = None
+            future._set_exception(e)
+            while self._pending:
+                f, _, _ = self._pending.popleft()
+                if not f.done():
+                    f._set_exception(e)
+            raise
+        try:
+            result = handler(data)
+        except ValueError as e:
+            if not future.done():
+                future._set_exception(e)
+            if isinstance(e, ConfigurationRejected):
+                for queued in self._rejected_glitches():
+                    if not queued.done():
+                        queued._set_exception(e)
+            return
+        if final and not future.done():
+            future._set_result(result)
+
+    def _drain_pending(self):
+        while self._pending:
+            self._process_pending_response()
 
     # def captureADC(self):
     #     # TODO will be replaced by command structure
@@ -147,13 +365,7 @@ class Faultier:
     #     return convert_uint8_samples(resp.samples)
     
     def _send_protobuf(self, protobufobj):
-        serialized = protobufobj.SerializeToString()
-        length = len(serialized)
-        # Header
-        self.device.write(b"FLTR")
-        self.device.write(struct.pack("<I", length))
-        self.device.write(serialized)
-        self.device.flush()
+        self._writer.write(protobufobj.SerializeToString())
 
     def _get_default_settings(self):
         return CommandConfigureGlitcher(
@@ -285,8 +497,31 @@ class Faultier:
             cmd.configure_glitcher.CopyFrom(config)
         else:    
             cmd.configure_glitcher.CopyFrom(self.glitcher_configuration)
+        self._device_configuration = None
         self._send_protobuf(cmd)
         self._check_ok()
+        self._device_configuration = cmd.configure_glitcher.SerializeToString()
+
+    def configuration_dirty(self, config = None):
+        """
+        Returns whether the glitcher configuration (or config, if provided) differs
+        from the one that was last uploaded to the Faultier, i.e. whether the next
+        glitch has to upload it again.
+        """
+        if config is None:
+            config = self.glitcher_configuration
+        return config.SerializeToString() != self._device_configuration
+
+    def _configuration_frame(self, serialized):
+        frame = self._configuration_frames.get(serialized)
+        if frame is None:
+            if len(self._configuration_frames) >= 256:
+                self._configuration_frames.clear()
+            cmd = self._command
+            cmd.configure_glitcher.ParseFromString(serialized)
+            frame = encode_frame(cmd.SerializeToString())
+            self._configuration_frames[serialized] = frame
+        return frame
 
     def glitch(self, delay = None, pulse = None):
         """
@@ -299,19 +534,103 @@ class Faultier:
         :param pulse: Pulse length for the glitch
         """
 
+        self.glitch_submit(delay, pulse).result()
+
+    def glitch_submit(self, delay = None, pulse = None):
+        """
+        Pipelined version of glitch(): Sends the configuration and the glitch
+        command to the Faultier without waiting for the responses, and returns
+        a ResponseFuture. Call result() on it to wait for the glitch and raise
+        errors such as trigger timeouts.
+
+        Multiple glitches (and checks, see swd_check_submit & co) can be
+        in flight at the same time, the Faultier executes them in order.
+
+        :param delay: Delay between trigger and glitch
+
+        :param pulse: Pulse length for the glitch
+        """
+
         if delay != None:
             self.glitcher_configuration.delay = delay
         if pulse != None:
             self.glitcher_configuration.pulse = pulse
-        self._glitch()
+        future = ResponseFuture(self, (self.glitcher_configuration.delay, self.glitcher_configuration.pulse))
+        self._submit_glitch(self.glitcher_configuration, future)
+        return future
+
+    def _submit_glitch(self, config, future):
+        # The configuration is only uploaded if it differs from the one that is
+        # already active on the Faultier. Either way configuration and glitch
+        # go out in a single write.
+        serialized = config.SerializeToString()
+        if serialized == self._device_configuration:
+            self.config_uploads_skipped += 1
+            self._writer.write_frames(self._glitch_frame)
+            self._pending.append((future, self._handle_glitch_response, True))
+            return
 
-    def _glitch(self):
-        self._send_configuration()
+        self._device_configuration = None
+        self._writer.write_frames(self._configuration_frame(serialized), self._glitch_frame)
+        self._device_configuration = serialized
+        self.config_uploads += 1
+        self._pending.append((future, self._handle_configuration_response, False))
+        self._pending.append((future, self._handle_glitch_response, True))
 
-        cmd = Command()
-        cmd.glitch.CopyFrom(CommandGlitch())
-        self._send_protobuf(cmd)
-        self._check_response()
+    def _handle_configuration_response(self, data):
+        try:
+            self._parse_ok(data)
+        except ValueError as e:
+            self._device_configuration = None
+            raise ConfigurationRejected(f"Glitcher configuration rejected ({e}), the glitch ran with the previous configuration.")
+
+    def _rejected_glitches(self):
+        # Glitches queued behind a rejected configuration without uploading
+        # their own relied on it, too. Yields their futures.
+        for future, handler, _ in self._pending:
+            if handler == self._handle_configuration_response:
+                break
+            if handler == self._handle_glitch_response:
+                yield future
+
+    def _handle_glitch_response(self, data):
+        self._parse_response(data)
+
+    def glitch_many(self, params, depth = 4):
+        """
+        Performs a glitch for every (delay, pulse) tuple in params, keeping up to
+        depth glitches in flight so that the USB round-trips overlap with the
+        glitches themselves. Yields a finished ResponseFuture per glitch, in
+        order. The parameters of the glitch are available as future.params.
+
+        Note that because glitches are queued ahead, anything you do with the
+        target between two yielded results runs while the next glitches are
+        already executing. Use depth=1 if you need strict lock-step.
+
+        Example::
+
+            for result in f.glitch_many((d, p) for d in range(1000, 2000) for p in range(5, 10)):
+                if result.exception():
+                    print("Trigger timeout at", result.params)
+
+        :param params: Iterable of (delay, pulse) tuples.
+
+        :param depth: The maximum number of glitches in flight.
+        """
+
+        if depth < 1:
+            raise ValueError(f"Depth must be at least 1. Provided {depth}.")
+        in_flight = collections.deque()
+        for delay, pulse in params:
+            in_flight.append(self.glitch_submit(delay, pulse))
+            if len(in_flight) >= depth:
+                future = in_flight.popleft()
+                future.exception()
+                yield future
+        while in_flight:
+            future = in_flight.popleft()
+            future.exception()
+            yield future
 
     def glitch_non_blocking(self, delay = None, pulse = None):
         """
@@ -320,26 +639,21 @@ class Faultier:
         on another piece of code (i.e. starting a debugger transaction or sending
         something via UART.)
 
-        You MUST call `glitch_check_non_blocking_response` for each glitch_non_blocking
-        call, otherwise the communication between the host and the Faultier will desync.
+        Call `glitch_check_non_blocking_response` for each glitch_non_blocking
+        call to receive the result. Other commands can be sent in the meantime,
+        their responses are matched in order.
         """
 
-        if delay != None:
-            self.glitcher_configuration.delay = delay
-        if pulse != None:
-            self.glitcher_configuration.pulse = pulse
-
-        self._send_configuration()
-        cmd = Command()
-        cmd.glitch.CopyFrom(CommandGlitch())
-        self._send_protobuf(cmd)
+        self._non_blocking.append(self.glitch_submit(delay, pulse))
     
     def glitch_check_non_blocking_response(self):
         """
         Reads the response for a non-blocking glitch from the Faultier. This function will
         then cause the error-exceptions such as TriggerTimeout etc.
         """
-        self._check_response()
+        if not self._non_blocking:
+            raise ValueError("No non-blocking glitch pending.")
+        self._non_blocking.popleft().result()
 
     def swd_check(self):
         """
@@ -347,25 +661,41 @@ class Faultier:
         can be found. Useful when for example checking whether a glitch re-enabled
         SWD such as on the STM32 RDP2 to RDP1 glitch.
         """
-        cmd = Command()
-        cmd.swd_check.CopyFrom(CommandSWDCheck(function = SWD_CHECK_ENABLED))
-        self._send_protobuf(cmd)
-        response = self._check_response()
-        return response.swd_check.enabled
+        return self.swd_check_submit().result()
+
+    def swd_check_submit(self):
+        """
+        Pipelined version of swd_check(). Returns a ResponseFuture whose result
+        is whether an SWD device was found.
+        """
+        future = ResponseFuture(self)
+        self._submit_frame(self._swd_check_frame, self._handle_swd_check_response, future)
+        return future
+
+    def _handle_swd_check_response(self, data):
+        return self._parse_response(data).swd_check.enabled
 
     def nrf52_check(self):
         """
         nRF52 specific check to see whether APPROTECT is disabled/flash can be read.
         """
-        cmd = Command()
-        cmd.swd_check.CopyFrom(CommandSWDCheck(function = SWD_CHECK_NRF52))
-        self._send_protobuf(cmd)
+        return self.nrf52_check_submit().result()
+
+    def nrf52_check_submit(self):
+        """
+        Pipelined version of nrf52_check(). Returns a ResponseFuture whose result
+        is whether APPROTECT is disabled.
+        """
+        future = ResponseFuture(self)
+        self._submit_frame(self._nrf52_check_frame, self._handle_nrf52_check_response, future)
+        return future
+
+    def _handle_nrf52_check_response(self, data):
         try:
-            response = self._check_response()
-        except:
+            response = self._parse_response(data)
+        except ValueError:
             # TODO check for debug errors only
             return False
-            pass
         return response.swd_check.enabled
 
     def power_cycle(self):
@@ -376,25 +706,57 @@ class Faultier:
         trigger, delay, pulse, and glitch-output disabled. This means that a power-cycle
         will also fill the ADC.
         """
+        self.power_cycle_submit().result()
+
+    def power_cycle_submit(self):
+        """
+        Pipelined version of power_cycle(). Returns a ResponseFuture.
+        """
         config = self._get_default_settings()
         config.power_cycle_output = self.glitcher_configuration.power_cycle_output
         config.power_cycle_length = self.glitcher_configuration.power_cycle_length
-        self._send_configuration(config)
+        future = ResponseFuture(self)
+        self._submit_glitch(config, future)
+        return future
 
-        cmd = Command()
-        cmd.glitch.CopyFrom(CommandGlitch())
-        self._send_protobuf(cmd)
-        self._check_response()
-
-    def read_adc(self):
+    def read_adc(self, scaled = False):
         """
         Receives the current ADC sample-buffer from the device.
+
+        Returns the raw samples as a read-only numpy.uint8 array, which
+        wraps the received bytes without copying them.
+
+        :param scaled: Return floats between 0 and 1 instead of the raw samples.
         """
-        cmd = Command()
-        cmd.read_adc.CopyFrom(CommandReadADC())
-        self._send_protobuf(cmd)
-        response = self._check_response()
-        return convert_uint8_samples(response.adc.samples)
+        samples = self.read_adc_submit().result()
+        if scaled:
+            return scale_adc_samples(samples)
+        return samples
+
+    def read_adc_into(self, out):
+        """
+        Receives the current ADC sample-buffer from the device into out, i.e. a
+        preallocated numpy.uint8 array or bytearray, and returns the number
+        of samples written. Avoids allocating a new array for every read.
+
+        :param out: A writable buffer that can hold at least sample_count bytes.
+        """
+        samples = self.read_adc_submit().result()
+        return _copy_adc_samples(samples, out)
+
+    def read_adc_submit(self):
+        """
+        Pipelined version of read_adc(). Returns a ResponseFuture whose result
+        are the raw ADC samples as numpy.uint8 array.
+        """
+        future = ResponseFuture(self)
+        self._submit_frame(self._read_adc_frame, self._handle_read_adc_response, future)
+        return future
+
+    def _handle_read_adc_response(self, data):
+        # numpy is only imported once the ADC is used, to keep the control path light.
+        import numpy as np
+        return np.frombuffer(self._parse_response(data).adc.samples, dtype=np.uint8)
 
     # @staticmethod
     # def nrf_flash_and_lock():
@@ -416,13 +778,23 @@ class Faultier:
     #     Faultier.nrf_lock()
 
     @staticmethod
-    def flash_nrf(path):
+    def flash_nrf(path, session = None, skip_unchanged = False):
         """
         Flashes a connect nRF52 with the provided firmware. Requires OpenOCD to be in path.
+
+        :param session: An OpenOCDSession to use instead of starting OpenOCD.
+
+        :param skip_unchanged: Only with a session: Do not recover and reflash if the chip
+                               already holds the firmware (compared using on-target checksums),
+                               only reset it. Flash outside of the image is not erased then,
+                               i.e. data a previous run left behind stays.
         """
         print("Flashing nRF...")
         if not os.path.isfile(path):
             raise Exception(f"File {path} not found.")
+        if session:
+            Faultier._session_flash_nrf(session, path, lock = False, skip_unchanged = skip_unchanged)
+            return
         cmd = [
             "openocd",
             "-f", "interface/tamarin.cfg",
@@ -445,14 +817,48 @@ class Faultier:
 
 
     @staticmethod
-    def lock_and_flash_nrf(path):
+    def _session_flash_nrf(session, path, lock, skip_unchanged):
+        # Through the package, see __init__.py.
+        from . import OpenOCDError
+        try:
+            if skip_unchanged and path.lower().endswith(".hex"):
+                locked = session.check_nrf_lock()
+                # Without lock, a locked chip has to be recovered, which erases it anyway.
+                if (lock or not locked) and session.image_unchanged(path, locked = locked):
+                    print("Firmware unchanged, skipping flashing.")
+                    # Still leave the target freshly reset, like flashing does.
+                    if lock and not locked:
+                        session.lock_nrf()
+                    else:
+                        session.reset(locked = locked)
+                    return
+            session.program(path, recover = True, reset = not lock)
+            print("Flashing successful: Verified OK")
+            if lock:
+                session.lock_nrf()
+        except OpenOCDError as e:
+            print("Error during flashing process:", e)
+
+    @staticmethod
+    def lock_and_flash_nrf(path, session = None, skip_unchanged = False):
         """
         Flashes and then APPROTECT-locks a connected nRF52 with the provided firmware.
         Requires OpenOCD to be in path.
+
+        :param session: An OpenOCDSession to use instead of starting OpenOCD.
+
+        :param skip_unchanged: Only with a session: If the chip already holds the firmware,
+                               only lock and reset it. A locked chip cannot be read, it counts
+                               as unchanged if the session flashed the same firmware before
+                               and has not erased it since, see OpenOCDSession.image_unchanged.
+                               Flash outside of the image is not erased when skipping.
         """
         print("Flashing nRF...")
         if not os.path.isfile(path):
             raise Exception(f"File {path} not found.")
+        if session:
+            Faultier._session_flash_nrf(session, path, lock = True, skip_unchanged = skip_unchanged)
+            return
         cmd = [
             "openocd",
             "-f", "interface/tamarin.cfg",
@@ -475,11 +881,16 @@ class Faultier:
 
 
     @staticmethod
-    def check_nrf_lock():
+    def check_nrf_lock(session = None):
         """
         Checks whether the connected device has APPROTECT enabled using OpenOCD.
-        Similar to nrf52_check, but much slower and using OpenOCD.
+        Similar to nrf52_check, but much slower and using OpenOCD - unless an
+        OpenOCDSession is passed, which only takes a register read.
+
+        :param session: An OpenOCDSession to use instead of starting OpenOCD.
         """
+        if session:
+            return session.check_nrf_lock()
         cmd = [
             "openocd",
             "-f", "interface/tamarin.cfg",
@@ -497,11 +908,17 @@ class Faultier:
             raise Exception("Failed to check locking status: " + e.stdout + e.stderr)
 
     @staticmethod
-    def lock_nrf():
+    def lock_nrf(session = None):
         """
         Locks the connect nRF52 using APPROTECT. Requires OpenOCD.
+
+        :param session: An OpenOCDSession to use instead of starting OpenOCD.
         """
         print("Locking nRF...")
+        if session:
+            session.lock_nrf()
+            print("Chip locked!")
+            return
         cmd = [
             "openocd",
             "-f", "interface/tamarin.cfg",
@@ -518,11 +935,17 @@ class Faultier:
 
 
     @staticmethod
-    def unlock_nrf():
+    def unlock_nrf(session = None):
         """
         Unlocks the connect nRF52 by running nrf52_recover in OpenOCD.
+
+        :param session: An OpenOCDSession to use instead of starting OpenOCD.
         """
         print("Unlocking nRF...")
+        if session:
+            session.unlock_nrf()
+            print("Chip unlocked!")
+            return
         cmd = [
             "openocd",
             "-f", "interface/tamarin.cfg",
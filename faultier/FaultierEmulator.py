@@ -0,0 +1,182 @@
+import os
+import select
+import struct
+import threading
+import time
+import tty
+from .faultier_pb2 import *
+from .FaultierFraming import FRAME_HEADER, FRAME_HEADER_LENGTH, encode_frame
+
+"""
+    A software stand-in for the control channel of a Faultier. It opens a
+    pseudo-terminal and answers the protocol like the firmware does, so
+    Faultier(path=emulator.path) works unchanged. Useful to benchmark and
+    test host-side code without a board and target. POSIX only.
+"""
+class FaultierEmulator:
+    """
+    All behaviour parameters can either be a fixed value or a callable, which is
+    called with the emulator for every command. The current glitcher configuration
+    is available as emulator.glitcher_configuration.
+
+    :param adc_samples: The bytes returned by read_adc. By default the emulator
+                        returns sample_count samples (see configure_adc) with a
+                        dip at the last glitch.
+
+    :param trigger_timeout: Whether a glitch that waits for a trigger responds with a trigger timeout.
+
+    :param swd_check: Result of swd_check().
+
+    :param nrf52_check: Result of nrf52_check().
+
+    :param latency: Seconds to wait before sending any response.
+
+    :param glitch_latency: Additional seconds a glitch or power-cycle takes.
+
+    :param version: The protocol version reported in the hello response.
+    """
+    def __init__(self, adc_samples = None, trigger_timeout = False, swd_check = False, nrf52_check = False,
+                 latency = 0, glitch_latency = 0, version = FAULTIER_VERSION):
+        self.adc_samples = adc_samples
+        self.trigger_timeout = trigger_timeout
+        self.swd_check = swd_check
+        self.nrf52_check = nrf52_check
+        self.latency = latency
+        self.glitch_latency = glitch_latency
+        self.version = version
+
+        self.glitcher_configuration = CommandConfigureGlitcher()
+        self.adc_configuration = CommandConfigureADC(source = ADC_CROWBAR, sample_count = 1000)
+        self.commands = 0
+        self.glitches = 0
+
+        self.path = None
+        self._master = None
+        self._slave = None
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        """
+        Opens the pseudo-terminal and starts answering commands in a background thread.
+        Returns the path of the serial device.
+        """
+        if self._running:
+            return self.path
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.path = os.ttyname(self._slave)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="FaultierEmulator", daemon=True)
+        self._thread.start()
+        return self.path
+
+    def stop(self):
+        """
+        Stops the emulator and closes the pseudo-terminal.
+        """
+        if not self._running:
+            return
+        self._running = False
+        self._thread.join()
+        os.close(self._master)
+        os.close(self._slave)
+        self._master = None
+        self._slave = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _value(self, value):
+        if callable(value):
+            return value(self)
+        return value
+
+    def _run(self):
+        buffer = bytearray()
+        while self._running:
+            readable, _, _ = select.select([self._master], [], [], 0.05)
+            if not readable:
+                continue
+            try:
+                data = os.read(self._master, 65536)
+            except OSError:
+                break
+            buffer += data
+            while len(buffer) >= FRAME_HEADER_LENGTH:
+                if buffer[0:4] != FRAME_HEADER:
+                    # Resynchronize on the next header, the firmware does the same.
+                    index = buffer.find(FRAME_HEADER, 1)
+                    del buffer[:index if index > 0 else len(buffer) - 3]
+                    continue
+                length = struct.unpack_from("<I", buffer, 4)[0]
+                if len(buffer) < FRAME_HEADER_LENGTH + length:
+                    break
+                cmd = Command()
+                cmd.ParseFromString(bytes(buffer[FRAME_HEADER_LENGTH:FRAME_HEADER_LENGTH + length]))
+                del buffer[:FRAME_HEADER_LENGTH + length]
+                self._respond(self.handle_command(cmd))
+
+    def _respond(self, response):
+        latency = self._value(self.latency)
+        if latency:
+            time.sleep(latency)
+        frame = memoryview(encode_frame(response.SerializeToString()))
+        while frame:
+            written = os.write(self._master, frame)
+            frame = frame[written:]
+
+    def handle_command(self, cmd):
+        """
+        Returns the Response for a Command. Can be overridden to emulate
+        other firmware behaviour.
+        """
+        self.commands += 1
+        resp = Response()
+        command_type = cmd.WhichOneof('cmd')
+        if command_type == 'hello':
+            resp.hello.version = self.version
+        elif command_type == 'configure_glitcher':
+            self.glitcher_configuration.CopyFrom(cmd.configure_glitcher)
+            resp.ok.SetInParent()
+        elif command_type == 'configure_adc':
+            if cmd.configure_adc.sample_count > 30000:
+                resp.error.message = "Sample count too large"
+            else:
+                self.adc_configuration.CopyFrom(cmd.configure_adc)
+                resp.ok.SetInParent()
+        elif command_type == 'glitch':
+            self.glitches += 1
+            glitch_latency = self._value(self.glitch_latency)
+            if glitch_latency:
+                time.sleep(glitch_latency)
+            if self.glitcher_configuration.trigger_type != TRIGGER_NONE and self._value(self.trigger_timeout):
+                resp.trigger_timeout.SetInParent()
+            else:
+                resp.ok.SetInParent()
+        elif command_type == 'read_adc':
+            samples = self._value(self.adc_samples)
+            if samples is None:
+                samples = self._default_adc_samples()
+            resp.adc.samples = bytes(samples)
+        elif command_type == 'swd_check':
+            if cmd.swd_check.function == SWD_CHECK_NRF52:
+                resp.swd_check.enabled = bool(self._value(self.nrf52_check))
+            else:
+                resp.swd_check.enabled = bool(self._value(self.swd_check))
+        else:
+            resp.error.message = f"Unsupported command: {command_type}"
+        return resp
+
+    def _default_adc_samples(self):
+        # A flat supply voltage with a crowbar dip at delay for pulse samples.
+        count = self.adc_configuration.sample_count
+        samples = bytearray(b"\xc8") * count
+        start = min(self.glitcher_configuration.delay, count)
+        end = min(start + max(self.glitcher_configuration.pulse, 1), count)
+        samples[start:end] = b"\x14" * (end - start)
+        return samples
@@ -0,0 +1,141 @@
+"""
+Framing of the Faultier control channel. Every Command and Response
+is sent as a frame consisting of the "FLTR" header, the length of the
+serialized protobuf as little-endian uint32, and the serialized protobuf.
+
+The reader and writer in here keep their buffers around between frames
+so that the per-glitch path does not allocate and uses as few calls
+into the serial device as possible.
+"""
+import struct
+
+FRAME_HEADER = b"FLTR"
+FRAME_HEADER_LENGTH = 8
+
+def encode_frame(payload: bytes):
+    """
+    Wraps a serialized Command (or Response) into a frame. Useful to
+    pre-compute frames that are sent over and over again.
+    """
+    return FRAME_HEADER + struct.pack("<I", len(payload)) + payload
+
+class IOStats:
+    """
+    Counts the traffic on the control channel. Calls are the number of
+    read/write calls into the serial device, which each cost at least
+    one syscall.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.frames_written = 0
+        self.frames_read = 0
+        self.write_calls = 0
+        self.read_calls = 0
+        self.bytes_written = 0
+        self.bytes_read = 0
+
+    def per_command(self):
+        """
+        Returns the average cost of a single command (i.e. a frame sent to the
+        Faultier, including reading its response) as a dictionary.
+        """
+        commands = max(self.frames_written, 1)
+        return {
+            "bytes_written": self.bytes_written / commands,
+            "bytes_read": self.bytes_read / commands,
+            "write_calls": self.write_calls / commands,
+            "read_calls": self.read_calls / commands,
+        }
+
+    def __repr__(self):
+        return (f"IOStats(frames_written={self.frames_written}, frames_read={self.frames_read}, "
+                f"write_calls={self.write_calls}, read_calls={self.read_calls}, "
+                f"bytes_written={self.bytes_written}, bytes_read={self.bytes_read})")
+
+class FrameWriter:
+    """
+    Writes frames to the device using a single write call per batch of
+    frames, assembled in a preallocated buffer.
+    """
+    def __init__(self, device, stats=None, size=4096):
+        self.device = device
+        self.stats = stats if stats is not None else IOStats()
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+
+    def _reserve(self, size):
+        if size > len(self._buffer):
+            self._buffer = bytearray(max(size, 2 * len(self._buffer)))
+            self._view = memoryview(self._buffer)
+
+    def write(self, payload):
+        """
+        Frames and writes a serialized protobuf.
+        """
+        length = len(payload)
+        total = FRAME_HEADER_LENGTH + length
+        self._reserve(total)
+        self._buffer[0:4] = FRAME_HEADER
+        struct.pack_into("<I", self._buffer, 4, length)
+        self._buffer[FRAME_HEADER_LENGTH:total] = payload
+        self._write(total, 1)
+
+    def write_frames(self, *frames):
+        """
+        Writes one or more already framed commands (see encode_frame) in a single write.
+        """
+        if len(frames) == 1:
+            self.device.write(frames[0])
+            self._count(len(frames[0]), 1)
+            return
+        total = 0
+        for frame in frames:
+            total += len(frame)
+        self._reserve(total)
+        offset = 0
+        for frame in frames:
+            self._buffer[offset:offset + len(frame)] = frame
+            offset += len(frame)
+        self._write(total, len(frames))
+
+    def _write(self, total, frames):
+        self.device.write(self._view[:total])
+        self._count(total, frames)
+
+    def _count(self, total, frames):
+        self.stats.frames_written += frames
+        self.stats.write_calls += 1
+        self.stats.bytes_written += total
+
+class FrameReader:
+    """
+    Reads frames from the device into a reusable buffer. The returned payload
+    is a memoryview into that buffer and is only valid until the next read.
+    """
+    def __init__(self, device, stats=None, size=32768):
+        self.device = device
+        self.stats = stats if stats is not None else IOStats()
+        self._header = bytearray(FRAME_HEADER_LENGTH)
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+
+    def read(self):
+        received = self.device.readinto(self._header)
+        self.stats.read_calls += 1
+        self.stats.bytes_read += received
+        if received != FRAME_HEADER_LENGTH or self._header[0:4] != FRAME_HEADER:
+            raise ValueError(f"Invalid header received: {bytes(self._header[:received])}")
+        length = struct.unpack_from("<I", self._header, 4)[0]
+        if length > len(self._buffer):
+            self._buffer = bytearray(length)
+            self._view = memoryview(self._buffer)
+        payload = self._view[:length]
+        received = self.device.readinto(payload) if length else 0
+        self.stats.read_calls += 1 if length else 0
+        self.stats.bytes_read += received
+        if received != length:
+            raise ValueError(f"Incomplete frame received: Expected {length} bytes, got {received}.")
+        self.stats.frames_read += 1
+        return payload
@@ -0,0 +1,173 @@
+import multiprocessing
+import queue
+import time
+import traceback
+from .Faultier import Faultier, FaultierDevice, find_faultiers
+
+"""
+    Runs a campaign on several Faultiers at once, one worker process per board,
+    and merges the results into a single GlitchDataCollection while they stream
+    in. As every board has its own process and serial connection, throughput
+    scales with the number of boards.
+"""
+
+class PoolWorker:
+    """
+    Passed to the campaign function in every worker process. Results are sent
+    to the main process in batches.
+
+    :ivar index: Index of this worker, 0 <= index < count.
+
+    :ivar count: Total number of workers, i.e. for RandomOrderGenerator.shard(count, index).
+
+    :ivar device: The FaultierDevice or path this worker glitches with.
+    """
+    def __init__(self, index, count, device, results, batch_size):
+        self.index = index
+        self.count = count
+        self.device = device
+        self._results = results
+        self._batch_size = batch_size
+        self._points = []
+
+    def add(self, key, delay, pulse):
+        """
+        Adds a point to the merged GlitchDataCollection, like GlitchDataCollection.add.
+        """
+        self._points.append((key, delay, pulse))
+        if len(self._points) >= self._batch_size:
+            self.flush()
+
+    def record_estimate(self, delay, pulse, successes, attempts, decision=None):
+        """
+        Records a point estimate in the merged collection, see GlitchDataCollection.record_estimate.
+        """
+        self.flush()
+        self._results.put(("estimate", self.index, (delay, pulse, successes, attempts, decision)))
+
+    def flush(self):
+        """
+        Sends the points added so far to the main process.
+        """
+        if self._points:
+            self._results.put(("points", self.index, self._points))
+            self._points = []
+
+def _worker_main(campaign, index, count, device, results, batch_size, args):
+    worker = PoolWorker(index, count, device, results, batch_size)
+    try:
+        if isinstance(device, FaultierDevice):
+            faultier = Faultier(serial_number=device.serial_number)
+        else:
+            faultier = Faultier(path=device)
+        try:
+            result = campaign(faultier, worker, *args)
+        finally:
+            faultier.device.close()
+        worker.flush()
+        results.put(("done", index, result))
+    except BaseException:
+        worker.flush()
+        results.put(("error", index, traceback.format_exc()))
+
+class FaultierPool:
+    """
+    Example::
+
+        # campaign.py - worker functions have to be importable, i.e. not defined in a notebook.
+        def campaign(f, worker, start, end):
+            for delay in RandomOrderGenerator(start, end, seed=1).shard(worker.count, worker.index):
+                f.glitch(delay, 10)
+                worker.add("success" if f.swd_check() else "nothing", delay, 10)
+
+        # notebook
+        pool = FaultierPool()
+        pool.run(campaign.campaign, gdc, args=(1000, 5000))
+
+    :param devices: List of FaultierDevice (see find_faultiers) or control channel
+                    paths. Defaults to all attached Faultiers.
+
+    :param batch_size: Number of points a worker collects before sending them.
+
+    :param context: The multiprocessing start method. spawn works on all platforms
+                    and does not inherit open serial ports.
+    """
+    def __init__(self, devices=None, batch_size=256, context="spawn"):
+        if devices is None:
+            devices = find_faultiers()
+        if not devices:
+            raise Exception("No Faultiers found.")
+        self.devices = list(devices)
+        self.batch_size = batch_size
+        self.context = multiprocessing.get_context(context)
+        # Points merged per worker during the last run.
+        self.points = [0] * len(self.devices)
+
+    def __len__(self):
+        return len(self.devices)
+
+    def run(self, campaign, gdc, args=(), callback=None, interval=1.0):
+        """
+        Runs campaign(faultier, worker, *args) on every device in its own process
+        and adds all results to gdc as they arrive. Returns the list of return
+        values of the campaigns. Raises an Exception after all workers finished
+        if any of them failed.
+
+        :param campaign: The campaign function. It and args need to be picklable.
+
+        :param gdc: The GlitchDataCollection to merge the results into. The keys the
+                    workers use need to be registered with add_data.
+
+        :param callback: Called as callback(pool) about every interval seconds
+                         while the campaign runs, i.e. to update a live plot.
+        """
+        results = self.context.Queue()
+        processes = [self.context.Process(target=_worker_main, name=f"FaultierPool-{index}",
+                                          args=(campaign, index, len(self.devices), device, results, self.batch_size, args),
+                                          daemon=True)
+                     for index, device in enumerate(self.devices)]
+        self.points = [0] * len(self.devices)
+        returns = [None] * len(self.devices)
+        errors = {}
+        running = set(range(len(processes)))
+        for process in processes:
+            process.start()
+        last_callback = time.time()
+        try:
+            while running:
+                try:
+                    kind, index, payload = results.get(timeout=interval)
+                except queue.Empty:
+                    for index in list(running):
+                        if not processes[index].is_alive() and processes[index].exitcode != 0:
+                            # Killed without reporting back.
+                            errors[index] = f"Worker exited with code {processes[index].exitcode}"
+                            running.discard(index)
+                    kind = None
+                if kind == "points":
+                    add = gdc.add
+                    for key, delay, pulse in payload:
+                        add(key, delay, pulse)
+                    self.points[index] += len(payload)
+                elif kind == "estimate":
+                    gdc.record_estimate(*payload)
+                elif kind == "done":
+                    returns[index] = payload
+                    running.discard(index)
+                elif kind == "error":
+                    errors[index] = payload
+                    running.discard(index)
+                if callback and time.time() - last_callback >= interval:
+                    callback(self)
+                    last_callback = time.time()
+        finally:
+            for process in processes:
+                if process.is_alive() and running:
+                    process.terminate()
+                process.join()
+        if callback:
+            callback(self)
+        if errors:
+            message = "\n".join(f"Worker {index} ({self.devices[index]}):\n{error}" for index, error in sorted(errors.items()))
+            raise Exception(f"{len(errors)} of {len(self.devices)} workers failed:\n{message}")
+        return returns
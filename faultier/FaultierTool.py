@@ -41,9 +41,21 @@ def faultier_nrf52_flash(file_path):
         print("Output:", e.stdout)
         print("Errors:", e.stderr)
 
-def openocd_program(config, path):
+def openocd_program(config, path, session=None):
+    """
+    Programs path with OpenOCD. If an OpenOCDSession is given, it is used
+    instead of starting OpenOCD, config is ignored then.
+    """
     if not os.path.isfile(path):
         raise Exception(f"File {path} not found.")
+    if session:
+        from faultier import OpenOCDError
+        try:
+            session.program(path, recover=True)
+            print("Flashing successful: Verified OK")
+        except OpenOCDError as e:
+            print("Error during flashing process:", e)
+        return
     if " " in path:
         raise Exception(f"Path contains spaces - unsupported.")
     if ";" in path:
@@ -119,6 +131,11 @@ def faultier_stm32_flash(file_path):
 def faultier_test(args=None):
     print("Running test...")
 
+def faultier_campaign(args):
+    from faultier.Campaign import Campaign
+    campaign = Campaign.load(args.config)
+    campaign.run(resume=not args.restart, limit=args.limit)
+
 def main():
     # Set up argparse
     parser = argparse.ArgumentParser(description="Faultier tool")
@@ -152,6 +169,13 @@ def main():
     flash_stm32_parser.add_argument("file", help="File path for flashing STM32")
     flash_stm32_parser.set_defaults(func=lambda args: faultier_stm32_flash(args.file))
 
+    # Campaign mode
+    campaign_parser = subparsers.add_parser("campaign", help="Run a glitch campaign from a configuration file")
+    campaign_parser.add_argument("config", help="JSON or TOML campaign configuration, see faultier.Campaign")
+    campaign_parser.add_argument("--restart", action="store_true", help="Do not resume, fail if the output already exists")
+    campaign_parser.add_argument("--limit", type=int, help="Stop after this many glitches")
+    campaign_parser.set_defaults(func=faultier_campaign)
+
     # Parse arguments and check for subcommand
     args = parser.parse_args()
 
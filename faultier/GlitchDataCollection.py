@@ -1,31 +1,210 @@
-import plotly.graph_objs as go
-import serial
 import struct
 import os
-from sys import platform
-from IPython.display import clear_output
-import random
-import time
-import matplotlib.pyplot as plt
-from tqdm.notebook import trange, tqdm
 import pickle
+import numpy as np
+import json
+import mmap
+import zlib
+from .GlitchHeatmap import GlitchHeatmap
+
+# On-disk format of the append-only log (see GlitchDataCollection.open_log):
+# The magic, followed by chunks of a type byte, the payload length, the CRC32
+# of the payload and the payload itself. A torn chunk at the end of the file
+# (i.e. after a crash) fails the length or CRC check and is ignored.
+LOG_MAGIC = b"FLTRGDC1"
+LOG_CHUNK_HEADER = struct.Struct("<cII")
+LOG_CATEGORY = b"C"
+LOG_POINTS = b"P"
+LOG_ESTIMATE = b"E"
+
+class GlitchDataLog:
+    """
+    Append-only log file backing a GlitchDataCollection. Every chunk is written
+    with a single write and, if fsync is enabled, synced to disk before returning.
+    """
+    def __init__(self, path, fsync=True):
+        self.path = path
+        self.fsync = fsync
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(LOG_MAGIC)
+            self._sync()
+
+    def _sync(self):
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+
+    def write_chunk(self, kind, payload):
+        self.file.write(LOG_CHUNK_HEADER.pack(kind, len(payload), zlib.crc32(payload)) + payload)
+        self._sync()
+
+    def write_category(self, key, glitch_data):
+        self.write_chunk(LOG_CATEGORY, json.dumps({
+            "key": key,
+            "name": glitch_data.name,
+            "color": glitch_data.color,
+            "alpha": glitch_data.alpha,
+            "zorder": glitch_data.zorder,
+            "render": glitch_data.render,
+        }).encode("utf-8"))
+
+    def write_points(self, delays, pulses, codes):
+        """
+        Writes a batch of points, given as int32, int32 and int16 numpy arrays.
+        """
+        self.write_chunk(LOG_POINTS, struct.pack("<I", len(codes)) + delays.tobytes() + pulses.tobytes() + codes.tobytes())
+
+    def write_estimate(self, delay, pulse, estimate):
+        self.write_chunk(LOG_ESTIMATE, json.dumps(dict(estimate, delay=delay, pulse=pulse)).encode("utf-8"))
+
+    def close(self):
+        self._sync()
+        self.file.close()
+
+    @staticmethod
+    def is_log(path):
+        with open(path, "rb") as f:
+            return f.read(len(LOG_MAGIC)) == LOG_MAGIC
+
+    @staticmethod
+    def replay(path, collection, max_points=None):
+        """
+        Replays the log at path into collection. Returns the length of the valid
+        part of the log, anything after it is a torn write.
+
+        :param max_points: Stop after this many points. The returned length then ends
+                           before the chunk holding the first point that was not
+                           replayed, the points of that chunk that were replayed are
+                           returned as well, as (length, (delays, pulses, codes)).
+        """
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size <= len(LOG_MAGIC):
+                return len(LOG_MAGIC)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if data[:len(LOG_MAGIC)] != LOG_MAGIC:
+                    raise ValueError(f"{path} is not a glitch data log.")
+                offset = len(LOG_MAGIC)
+                while offset + LOG_CHUNK_HEADER.size <= len(data):
+                    kind, length, crc = LOG_CHUNK_HEADER.unpack_from(data, offset)
+                    start = offset + LOG_CHUNK_HEADER.size
+                    payload = data[start:start + length]
+                    if len(payload) != length or zlib.crc32(payload) != crc:
+                        break
+                    if max_points is not None and kind == LOG_POINTS:
+                        count = struct.unpack_from("<I", payload)[0]
+                        keep = max_points - len(collection)
+                        if count > keep:
+                            rest = GlitchDataLog._points(payload)
+                            rest = tuple(column[:keep].copy() for column in rest)
+                            collection._flush_staged()
+                            collection._extend_columns(*rest)
+                            return offset, rest
+                    GlitchDataLog._apply(kind, payload, collection)
+                    offset = start + length
+                if max_points is not None:
+                    return offset, None
+                return offset
+
+    @staticmethod
+    def _points(payload):
+        count = struct.unpack_from("<I", payload)[0]
+        return (np.frombuffer(payload, dtype=np.int32, count=count, offset=4),
+                np.frombuffer(payload, dtype=np.int32, count=count, offset=4 + 4 * count),
+                np.frombuffer(payload, dtype=np.int16, count=count, offset=4 + 8 * count))
+
+    @staticmethod
+    def _apply(kind, payload, collection):
+        if kind == LOG_CATEGORY:
+            category = json.loads(payload.decode("utf-8"))
+            collection.add_data(category.pop("key"), **category)
+        elif kind == LOG_POINTS:
+            collection._flush_staged()
+            collection._extend_columns(*GlitchDataLog._points(payload))
+        elif kind == LOG_ESTIMATE:
+            estimate = json.loads(payload.decode("utf-8"))
+            collection.point_estimates[(estimate.pop("delay"), estimate.pop("pulse"))] = estimate
+
+class _Column:
+    """
+    A numpy array that grows by doubling its capacity. view() returns the filled
+    part without copying; as points are only appended, views stay valid.
+    """
+    def __init__(self, dtype, capacity=1024):
+        self.array = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def extend(self, values):
+        end = self.size + len(values)
+        if end > len(self.array):
+            grown = np.empty(max(end, 2 * len(self.array)), dtype=self.array.dtype)
+            grown[:self.size] = self.array[:self.size]
+            self.array = grown
+        self.array[self.size:end] = values
+        self.size = end
+
+    def view(self, start=0):
+        view = self.array[start:self.size]
+        view.flags.writeable = False
+        return view
+
+    def __len__(self):
+        return self.size
+
+    def __getstate__(self):
+        # Only the filled part is pickled.
+        return (self.array[:self.size].copy(),)
+
+    def __setstate__(self, state):
+        self.array = np.array(state[0])
+        self.size = len(self.array)
 
 class GlitchData:
-    def __init__(self, name, color="gray", alpha=0.3, zorder=1, render=True):
+    """
+    One category (i.e. "success" or "reset") of a GlitchDataCollection. The
+    points themselves live in the columns of the collection, delays and
+    pulses are numpy arrays selected from them.
+
+    Note that delays and pulses used to be lists. They are read-only arrays
+    now, points are added with add(), i.e. gd.add(delay, pulse) instead of
+    gd.delays.append(delay). Use gd.delays.tolist() where a list is needed.
+    """
+    def __init__(self, name, color="gray", alpha=0.3, zorder=1, render=True, collection=None, code=0):
         self.name = name
-        self.delays = []
-        self.pulses = []
         self.color = color
         self.alpha = alpha
         self.zorder = zorder
         self.render = render
-        pass
+        if collection is None:
+            # Standalone category, backed by a private collection.
+            collection = GlitchDataCollection()
+            collection._keys.append(None)
+            collection.data[None] = self
+        self._collection = collection
+        self._code = code
 
     def add(self, delay, pulse):
-        self.delays.append(delay)
-        self.pulses.append(pulse)
+        self._collection._append(self._code, delay, pulse)
+
+    @property
+    def delays(self):
+        """
+        Read-only numpy array of the delays of this category.
+        """
+        return self._collection._select(self._code)[0]
+
+    @property
+    def pulses(self):
+        """
+        Read-only numpy array of the pulses of this category.
+        """
+        return self._collection._select(self._code)[1]
+
+    def __len__(self):
+        return self._collection.count(self._code)
     
     def plot_delays(self):
+        import matplotlib.pyplot as plt
         # Create histogram
         plt.hist(self.delays, bins='auto', color='blue', alpha=0.7, rwidth=0.85)
 
@@ -40,6 +219,7 @@ class GlitchData:
 
 
     def plot_pulses(self):
+        import matplotlib.pyplot as plt
         # Create histogram
         plt.hist(self.pulses, bins='auto', color='blue', alpha=0.7, rwidth=0.85)
 
@@ -54,32 +234,412 @@ class GlitchData:
     
 
 class GlitchDataCollection:
+    """
+    Collects the results of a glitch campaign, i.e. which (delay, pulse) caused
+    which outcome.
+
+    The points are stored column-wise: One compact array each for delays,
+    pulses and the category code of every point, in the order they were added.
+    The per-category GlitchData objects select from these columns; the
+    selection is cached and extended incrementally as points are added.
+
+    New points are staged in plain lists first (appending to those is
+    cheaper than appending to an array) and moved into the columns in
+    chunks of STAGING_SIZE, or of the batch size of the log, see open_log.
+    """
+    STAGING_SIZE = 4096
+    _staging_size = STAGING_SIZE
+    _log = None
+    _heatmap = None
+    _staged_estimates = ()
+
     def __init__(self):
         self.data = {}
-        self.min_x = 0
-        self.max_x = 0
-        self.min_y = 0
-        self.max_y = 0
-        pass
+        # Category code -> key, codes index into this list.
+        self._keys = []
+        self._init_columns()
+        self._staging_size = self.STAGING_SIZE
+        self._log = None
+        self._heatmap = None
+        # (delay, pulse) -> estimate of points that were tested repeatedly, see record_estimate.
+        self.point_estimates = {}
+
+    def _init_columns(self):
+        self._delays = _Column(np.int32)
+        self._pulses = _Column(np.int32)
+        self._codes = _Column(np.int16)
+        self._staged_delays = []
+        self._staged_pulses = []
+        self._staged_codes = []
+        # (min_x, max_x, min_y, max_y) and number of points per code of the columns,
+        # updated whenever points are moved into them.
+        self._bounds = None
+        self._counts = []
+        # Code -> (points processed, delays, pulses), see _select.
+        self._categories = {}
 
     def add_data(self, key, name, color="gray", alpha=0.3, zorder=1, render=True):
-        self.data[key] = GlitchData(name, color=color, alpha=alpha, zorder=zorder, render=render)
+        code = len(self._keys)
+        self._keys.append(key)
+        self.data[key] = GlitchData(name, color=color, alpha=alpha, zorder=zorder, render=render, collection=self, code=code)
+        if self._log:
+            self._log.write_category(key, self.data[key])
+
+    def open_log(self, path, batch_size=1024, fsync=True, max_points=None):
+        """
+        Persists the collection incrementally into an append-only log: From now on
+        every batch_size points added are written to path as one chunk, so a crash
+        loses at most the last batch. Call flush() to write the current batch early,
+        and close_log() when done. GlitchDataCollection.load() reads the log back.
+
+        If path already holds a log, it is replayed into this (empty) collection
+        and new points are appended to it, i.e. to resume a campaign.
+
+        Category keys need to be strings or integers to be stored in the log.
+
+        :param batch_size: Number of points per chunk.
+
+        :param fsync: Whether every chunk is synced to disk before add() returns.
+                      Without it a chunk survives a crash of the Python process
+                      but not necessarily a crash of the OS.
+
+        :param max_points: Only keep the first max_points points of an existing log and
+                           truncate the rest, i.e. to go back to a checkpoint. Categories
+                           and estimates written before the cut are kept.
+        """
+        if self._log:
+            raise ValueError("A log is already open.")
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            if len(self) or self.data:
+                raise ValueError("An existing log can only be resumed into an empty collection.")
+            rest = None
+            if max_points is None:
+                valid_length = GlitchDataLog.replay(path, self)
+            else:
+                valid_length, rest = GlitchDataLog.replay(path, self, max_points)
+            # Drop a torn chunk at the end (or everything after max_points) before appending to the log.
+            os.truncate(path, valid_length)
+            self._log = GlitchDataLog(path, fsync)
+            if rest is not None and len(rest[2]):
+                # The kept part of the chunk that was cut.
+                self._log.write_points(*rest)
+        else:
+            self._flush_staged()
+            self._log = GlitchDataLog(path, fsync)
+            for code, key in enumerate(self._keys):
+                glitch_data = self.data[key]
+                self._log.write_category(key, glitch_data)
+            if len(self):
+                self._log.write_points(self.delays, self.pulses, self.codes)
+            for (delay, pulse), estimate in self.point_estimates.items():
+                self._log.write_estimate(delay, pulse, estimate)
+        self._staging_size = batch_size
+        self._staged_estimates = []
+
+    def record_estimate(self, delay, pulse, successes, attempts, decision=None):
+        """
+        Records the success estimate of a point that was glitched repeatedly, i.e.
+        by SequentialTester.run. Estimates are kept in point_estimates and written
+        to the log, a later estimate for the same point replaces the earlier one.
+
+        :param decision: The outcome of the test, i.e. "above" or "below" the threshold.
+        """
+        estimate = {
+            "successes": successes,
+            "attempts": attempts,
+            "rate": successes / attempts if attempts else None,
+            "decision": decision,
+        }
+        self.point_estimates[(delay, pulse)] = estimate
+        if self._log:
+            if self._staged_codes:
+                # Written after the staged points, so an estimate never precedes its points in the log.
+                self._staged_estimates.append((delay, pulse, estimate))
+            else:
+                self._log.write_estimate(delay, pulse, estimate)
+
+    def flush(self):
+        """
+        Writes points that have been added but not yet persisted to the log.
+        """
+        self._flush_staged()
+
+    def close_log(self):
+        """
+        Writes the remaining points and closes the log.
+        """
+        if not self._log:
+            return
+        self._flush_staged()
+        self._log.close()
+        self._log = None
+        self._staging_size = self.STAGING_SIZE
     
     def add(self, key, delay, pulse):
-        if not self.min_x or self.min_x > delay:
-            self.min_x = delay
-        if not self.max_x or self.max_x < delay:
-            self.max_x = delay
-        if not self.min_y or self.min_y > pulse:
-            self.min_y = pulse
-        if not self.max_y or self.max_y < pulse:
-            self.max_y = pulse
-        self.data[key].add(delay, pulse)
+        # Hot path, called for every glitch. The code is looked up first, so an
+        # unknown key raises before anything is staged and the columns stay aligned.
+        code = self.data[key]._code
+        self._staged_delays.append(delay)
+        self._staged_pulses.append(pulse)
+        codes = self._staged_codes
+        codes.append(code)
+        if len(codes) >= self._staging_size:
+            self._flush_staged()
+
+    def _append(self, code, delay, pulse):
+        self._staged_delays.append(delay)
+        self._staged_pulses.append(pulse)
+        self._staged_codes.append(code)
+        if len(self._staged_codes) >= self._staging_size:
+            self._flush_staged()
+
+    def _flush_staged(self):
+        if not self._staged_codes:
+            return
+        count = len(self._staged_codes)
+        delays = np.fromiter(self._staged_delays, dtype=np.int32, count=count)
+        pulses = np.fromiter(self._staged_pulses, dtype=np.int32, count=count)
+        codes = np.fromiter(self._staged_codes, dtype=np.int16, count=count)
+        if self._log:
+            self._log.write_points(delays, pulses, codes)
+            for estimate in self._staged_estimates:
+                self._log.write_estimate(*estimate)
+            self._staged_estimates = []
+        self._extend_columns(delays, pulses, codes)
+        self._staged_delays = []
+        self._staged_pulses = []
+        self._staged_codes = []
+
+    def _extend_columns(self, delays, pulses, codes):
+        if len(codes) == 0:
+            return
+        self._delays.extend(delays)
+        self._pulses.extend(pulses)
+        self._codes.extend(codes)
+        bounds = (int(delays.min()), int(delays.max()), int(pulses.min()), int(pulses.max()))
+        if self._bounds is not None:
+            bounds = (min(bounds[0], self._bounds[0]), max(bounds[1], self._bounds[1]),
+                      min(bounds[2], self._bounds[2]), max(bounds[3], self._bounds[3]))
+        self._bounds = bounds
+        counts = np.bincount(codes, minlength=len(self._counts))
+        self._counts = [previous + int(count) for previous, count in zip(self._counts + [0] * len(counts), counts)]
+        if self._heatmap is not None:
+            self._heatmap.add_points(codes, delays, pulses)
+
+    def add_many(self, key, delays, pulses):
+        """
+        Adds multiple points of the same category at once.
+
+        :param delays: Sequence or numpy array of delays.
+
+        :param pulses: Sequence or numpy array of pulses, same length as delays.
+        """
+        delays = np.asarray(delays, dtype=np.int32)
+        pulses = np.asarray(pulses, dtype=np.int32)
+        if delays.shape != pulses.shape:
+            raise ValueError("delays and pulses must have the same length.")
+        self._flush_staged()
+        codes = np.full(len(delays), self.data[key]._code, dtype=np.int16)
+        if self._log:
+            self._log.write_points(delays, pulses, codes)
+        self._extend_columns(delays, pulses, codes)
 
     def get_data(self, key):
         return self.data[key]
 
+    def __len__(self):
+        return len(self._codes) + len(self._staged_codes)
+
+    def count(self, code=None):
+        """
+        Number of points, either in total or with the given category code.
+        """
+        if code is None:
+            return len(self)
+        # Staged points are counted in place, flushing here would write tiny log chunks.
+        columns = self._counts[code] if code < len(self._counts) else 0
+        return columns + self._staged_codes.count(code)
+
+    def _select(self, code):
+        # Returns (delays, pulses) of a category. Only the points added since the
+        # last call are scanned, the selection grows like the columns do.
+        self._flush_staged()
+        processed, delays, pulses = self._categories.get(code) or (0, _Column(np.int32, 0), _Column(np.int32, 0))
+        if processed < len(self._codes):
+            mask = self._codes.view(processed) == code
+            delays.extend(self._delays.view(processed)[mask])
+            pulses.extend(self._pulses.view(processed)[mask])
+            self._categories[code] = (len(self._codes), delays, pulses)
+        return delays.view(), pulses.view()
+
+    def rows(self, start=0):
+        """
+        Returns (delays, pulses, codes) of the points from index start on, in the
+        order they were added, as read-only views without copying, so consumers
+        can cheaply pick up new points since their last call.
+        """
+        self._flush_staged()
+        return self._delays.view(start), self._pulses.view(start), self._codes.view(start)
+
+    @property
+    def delays(self):
+        """
+        The delays of all points, in the order they were added.
+        """
+        self._flush_staged()
+        return self._delays.view()
+
+    @property
+    def pulses(self):
+        """
+        The pulses of all points, in the order they were added.
+        """
+        self._flush_staged()
+        return self._pulses.view()
+
+    @property
+    def codes(self):
+        """
+        The category code of all points. keys[code] is the corresponding key.
+        """
+        self._flush_staged()
+        return self._codes.view()
+
+    @property
+    def keys(self):
+        return list(self._keys)
+
+    def enable_heatmap(self, delay_range=None, pulse_range=None, delay_bins=100, pulse_bins=50):
+        """
+        Starts maintaining a GlitchHeatmap, a binned count of the points of every
+        category over the delay x pulse plane. It is filled with the existing
+        points and then kept up to date as points are added. Returns the heatmap.
+
+        :param delay_range: (start, end) of the delays to index. Defaults to the range of the current points.
+
+        :param pulse_range: (start, end) of the pulses to index. Defaults to the range of the current points.
+                            Both ranges are required if the collection is empty, i.e. at the start of a campaign.
+        """
+        if not len(self) and (delay_range is None or pulse_range is None):
+            raise ValueError("The collection is empty, pass delay_range and pulse_range.")
+        # Staged points are moved into the columns first, otherwise they would be
+        # counted once here and once when they are flushed.
+        self._flush_staged()
+        min_x, max_x, min_y, max_y = self.bounds()
+        if delay_range is None:
+            delay_range = (min_x, max_x + 1)
+        if pulse_range is None:
+            pulse_range = (min_y, max_y + 1)
+        heatmap = GlitchHeatmap(delay_range, pulse_range, delay_bins=delay_bins, pulse_bins=pulse_bins)
+        heatmap.add_points(self.codes, self.delays, self.pulses)
+        self._heatmap = heatmap
+        return heatmap
+
+    @property
+    def heatmap(self):
+        """
+        The GlitchHeatmap of this collection, None unless enable_heatmap() was called.
+        """
+        self._flush_staged()
+        return self._heatmap
+
+    def _codes_for(self, keys):
+        return [code for code, key in enumerate(self._keys) if key in keys]
+
+    def success_rate(self, success_keys, z=1.96):
+        """
+        Returns the per-cell success rate of the heatmap and its confidence interval
+        as (rate, lower, upper) arrays, see GlitchHeatmap.success_rate.
+
+        :param success_keys: The category keys that count as success.
+        """
+        if self.heatmap is None:
+            raise ValueError("No heatmap enabled, call enable_heatmap() first.")
+        return self.heatmap.success_rate(self._codes_for(success_keys), z=z)
+
+    def plot_heatmap(self, success_keys, min_attempts=1):
+        """
+        Plots the success rate per heatmap cell. Unlike plot(), the cost does
+        not depend on the number of points.
+
+        :param success_keys: The category keys that count as success.
+        """
+        if self.heatmap is None:
+            raise ValueError("No heatmap enabled, call enable_heatmap() first.")
+        from IPython.display import clear_output
+        clear_output(wait=True)
+        return self.heatmap.plot(self._codes_for(success_keys), min_attempts=min_attempts)
+
+    def bounds(self):
+        """
+        Returns (min_x, max_x, min_y, max_y) of all points, or zeros if there are none.
+        """
+        if not self._staged_codes:
+            return self._bounds or (0, 0, 0, 0)
+        # Staged points are included without flushing them, see count().
+        bounds = (min(self._staged_delays), max(self._staged_delays), min(self._staged_pulses), max(self._staged_pulses))
+        if self._bounds is None:
+            return bounds
+        return (min(bounds[0], self._bounds[0]), max(bounds[1], self._bounds[1]),
+                min(bounds[2], self._bounds[2]), max(bounds[3], self._bounds[3]))
+
+    @property
+    def min_x(self):
+        return self.bounds()[0]
+
+    @property
+    def max_x(self):
+        return self.bounds()[1]
+
+    @property
+    def min_y(self):
+        return self.bounds()[2]
+
+    @property
+    def max_y(self):
+        return self.bounds()[3]
+
+    def __getstate__(self):
+        self._flush_staged()
+        state = self.__dict__.copy()
+        state["_categories"] = {}
+        # The log stays with this object, a copy is not persisted.
+        state["_log"] = None
+        state["_staged_estimates"] = []
+        state["_staging_size"] = self.STAGING_SIZE
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__.setdefault("point_estimates", {})
+        if isinstance(state.get("_codes"), _Column):
+            return
+        # Collections pickled by older versions store a list of delays and
+        # pulses in every GlitchData.
+        for name in ("min_x", "max_x", "min_y", "max_y"):
+            self.__dict__.pop(name, None)
+        self._keys = []
+        columns = ([], [], [])
+        for key, glitch_data in self.data.items():
+            code = len(self._keys)
+            self._keys.append(key)
+            delays = glitch_data.__dict__.pop("delays", [])
+            pulses = glitch_data.__dict__.pop("pulses", [])
+            glitch_data._collection = self
+            glitch_data._code = code
+            columns[0].extend(delays)
+            columns[1].extend(pulses)
+            columns[2].extend([code] * len(delays))
+        self._init_columns()
+        self._log = None
+        self._heatmap = None
+        self._extend_columns(np.asarray(columns[0], dtype=np.int32), np.asarray(columns[1], dtype=np.int32),
+                             np.asarray(columns[2], dtype=np.int16))
+
     def plot(self, x=None, y=None):
+        # Plotting libraries are only loaded when needed, see faultier/__init__.py.
+        import matplotlib.pyplot as plt
+        from IPython.display import clear_output
         if not x:
             x = [self.min_x, self.max_x]
         if not y:
@@ -106,10 +666,17 @@ class GlitchDataCollection:
         plt.show()
 
     def save(self, filename):
-        f = open(filename, "wb")
-        pickle.dump(self, f)
+        with open(filename, "wb") as f:
+            pickle.dump(self, f)
 
     @staticmethod
     def load(filename):
-        f = open(filename, "rb")
-        return pickle.load(f)
+        """
+        Loads a collection stored with save() or written by open_log().
+        """
+        if GlitchDataLog.is_log(filename):
+            collection = GlitchDataCollection()
+            GlitchDataLog.replay(filename, collection)
+            return collection
+        with open(filename, "rb") as f:
+            return pickle.load(f)
@@ -0,0 +1,150 @@
+import numpy as np
+
+class GlitchHeatmap:
+    """
+    A binned index over the delay x pulse plane, counting the points of every
+    category per cell. Updating it is O(1) per point and queries and plots
+    only touch the grid, regardless of how many points were added.
+
+    Usually created through GlitchDataCollection.enable_heatmap(), which keeps
+    it up to date and translates category keys into the codes used here.
+
+    :param delay_range: (start, end) of the delays to index, end is exclusive.
+
+    :param pulse_range: (start, end) of the pulses to index, end is exclusive.
+
+    :param delay_bins: Number of cells along the delay axis.
+
+    :param pulse_bins: Number of cells along the pulse axis.
+    """
+    def __init__(self, delay_range, pulse_range, delay_bins=100, pulse_bins=50):
+        self.delay_range = (int(delay_range[0]), int(delay_range[1]))
+        self.pulse_range = (int(pulse_range[0]), int(pulse_range[1]))
+        if self.delay_range[1] <= self.delay_range[0] or self.pulse_range[1] <= self.pulse_range[0]:
+            raise ValueError("Ranges must be given as (start, end) with end > start.")
+        # More bins than values would only add empty cells.
+        self.delay_bins = min(delay_bins, self.delay_range[1] - self.delay_range[0])
+        self.pulse_bins = min(pulse_bins, self.pulse_range[1] - self.pulse_range[0])
+        self.counts = np.zeros((0, self.delay_bins, self.pulse_bins), dtype=np.int64)
+        # Points outside of the ranges are not binned, only counted.
+        self.outside = 0
+
+    def _ensure_categories(self, count):
+        if count > self.counts.shape[0]:
+            self.counts = np.pad(self.counts, ((0, count - self.counts.shape[0]), (0, 0), (0, 0)))
+
+    def bin_index(self, delay, pulse):
+        """
+        Returns the (delay_bin, pulse_bin) cell of a point, or None if it is outside of the ranges.
+        """
+        delay_start, delay_end = self.delay_range
+        pulse_start, pulse_end = self.pulse_range
+        if not (delay_start <= delay < delay_end and pulse_start <= pulse < pulse_end):
+            return None
+        return ((delay - delay_start) * self.delay_bins // (delay_end - delay_start),
+                (pulse - pulse_start) * self.pulse_bins // (pulse_end - pulse_start))
+
+    def cell_bounds(self, delay_bin, pulse_bin):
+        """
+        Returns the (delay_start, delay_end, pulse_start, pulse_end) of a cell, ends are exclusive.
+        """
+        delay_start, delay_end = self.delay_range
+        pulse_start, pulse_end = self.pulse_range
+        delay_width = delay_end - delay_start
+        pulse_width = pulse_end - pulse_start
+        return (delay_start - (-delay_bin * delay_width // self.delay_bins),
+                delay_start - (-(delay_bin + 1) * delay_width // self.delay_bins),
+                pulse_start - (-pulse_bin * pulse_width // self.pulse_bins),
+                pulse_start - (-(pulse_bin + 1) * pulse_width // self.pulse_bins))
+
+    def add(self, code, delay, pulse):
+        """
+        Counts a single point of category code.
+        """
+        index = self.bin_index(delay, pulse)
+        if index is None:
+            self.outside += 1
+            return
+        self._ensure_categories(code + 1)
+        self.counts[code, index[0], index[1]] += 1
+
+    def add_points(self, codes, delays, pulses):
+        """
+        Counts many points at once, given as arrays of category codes, delays and pulses.
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        delays = np.asarray(delays, dtype=np.int64)
+        pulses = np.asarray(pulses, dtype=np.int64)
+        if len(codes) == 0:
+            return
+        delay_start, delay_end = self.delay_range
+        pulse_start, pulse_end = self.pulse_range
+        inside = (delays >= delay_start) & (delays < delay_end) & (pulses >= pulse_start) & (pulses < pulse_end)
+        self.outside += int(len(codes) - np.count_nonzero(inside))
+        codes = codes[inside]
+        if len(codes) == 0:
+            return
+        self._ensure_categories(int(codes.max()) + 1)
+        delay_bins = (delays[inside] - delay_start) * self.delay_bins // (delay_end - delay_start)
+        pulse_bins = (pulses[inside] - pulse_start) * self.pulse_bins // (pulse_end - pulse_start)
+        flat = (codes * self.delay_bins + delay_bins) * self.pulse_bins + pulse_bins
+        self.counts += np.bincount(flat, minlength=self.counts.size).reshape(self.counts.shape)
+
+    def category_counts(self, codes):
+        """
+        Per-cell number of points in any of the given category codes.
+        """
+        codes = [code for code in codes if code < self.counts.shape[0]]
+        if not codes:
+            return np.zeros((self.delay_bins, self.pulse_bins), dtype=np.int64)
+        return self.counts[codes].sum(axis=0)
+
+    def total_counts(self):
+        """
+        Per-cell number of points of all categories.
+        """
+        return self.counts.sum(axis=0)
+
+    def success_rate(self, success_codes, z=1.96):
+        """
+        Returns the per-cell success rate and its Wilson score confidence interval
+        as three (delay_bins, pulse_bins) arrays: rate, lower, upper. Cells without
+        any points are NaN.
+
+        :param success_codes: The category codes that count as success.
+
+        :param z: The z-score of the interval, 1.96 for 95% confidence.
+        """
+        successes = self.category_counts(success_codes).astype(np.float64)
+        total = self.total_counts().astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rate = successes / total
+            denominator = 1 + z * z / total
+            center = (rate + z * z / (2 * total)) / denominator
+            margin = z * np.sqrt(rate * (1 - rate) / total + z * z / (4 * total * total)) / denominator
+        empty = total == 0
+        rate[empty] = np.nan
+        lower = np.where(empty, np.nan, np.clip(center - margin, 0, 1))
+        upper = np.where(empty, np.nan, np.clip(center + margin, 0, 1))
+        return rate, lower, upper
+
+    def plot(self, success_codes, title="Success rate", min_attempts=1, ax=None):
+        """
+        Plots the success rate per cell as heatmap. Cells with fewer than
+        min_attempts points are left blank.
+        """
+        import matplotlib.pyplot as plt
+        rate, _, _ = self.success_rate(success_codes)
+        rate = np.ma.masked_where(np.isnan(rate) | (self.total_counts() < min_attempts), rate)
+        show = ax is None
+        if ax is None:
+            _, ax = plt.subplots()
+        image = ax.imshow(rate.T, origin="lower", aspect="auto", interpolation="nearest", vmin=0, vmax=1,
+                          extent=(self.delay_range[0], self.delay_range[1], self.pulse_range[0], self.pulse_range[1]))
+        ax.figure.colorbar(image, ax=ax, label="Success rate")
+        ax.set_xlabel("Delay")
+        ax.set_ylabel("Pulse")
+        ax.set_title(title)
+        if show:
+            plt.show()
+        return ax
@@ -0,0 +1,88 @@
+import hashlib
+
+"""
+    Minimal Intel HEX reader. OpenOCDSession keeps the digest of the image it
+    programmed, to know what a locked chip (which cannot be read) holds.
+"""
+
+DATA = 0x00
+END_OF_FILE = 0x01
+EXTENDED_SEGMENT_ADDRESS = 0x02
+START_SEGMENT_ADDRESS = 0x03
+EXTENDED_LINEAR_ADDRESS = 0x04
+START_LINEAR_ADDRESS = 0x05
+
+class HexImage:
+    """
+    Example::
+
+        image = HexImage("example_firmware/nrf52832_xxaa.hex")
+        for address, data in image.regions:
+            print(hex(address), len(data))
+
+    :param path: Path of the Intel HEX file.
+
+    :ivar regions: List of (address, bytes) of the contiguous data, sorted by address.
+
+    :ivar digest: SHA-256 over all regions and their addresses.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.regions = self._parse(path)
+        digest = hashlib.sha256()
+        for address, data in self.regions:
+            digest.update(address.to_bytes(4, "little") + len(data).to_bytes(4, "little"))
+            digest.update(data)
+        self.digest = digest.hexdigest()
+
+    def _parse(self, path):
+        chunks = []
+        base = 0
+        with open(path) as f:
+            for number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                if not line.startswith(":"):
+                    raise ValueError(f"{path}:{number}: Missing start code.")
+                try:
+                    record = bytes.fromhex(line[1:])
+                except ValueError:
+                    raise ValueError(f"{path}:{number}: Invalid hex digits.")
+                if len(record) < 5 or len(record) != record[0] + 5:
+                    raise ValueError(f"{path}:{number}: Invalid record length.")
+                if sum(record) & 0xFF:
+                    raise ValueError(f"{path}:{number}: Checksum mismatch.")
+                offset = int.from_bytes(record[1:3], "big")
+                kind = record[3]
+                payload = record[4:-1]
+                if kind == DATA:
+                    chunks.append((base + offset, payload))
+                elif kind == END_OF_FILE:
+                    break
+                elif kind == EXTENDED_SEGMENT_ADDRESS:
+                    base = int.from_bytes(payload, "big") << 4
+                elif kind == EXTENDED_LINEAR_ADDRESS:
+                    base = int.from_bytes(payload, "big") << 16
+                elif kind in (START_SEGMENT_ADDRESS, START_LINEAR_ADDRESS):
+                    # Only relevant for loaders that jump to the image.
+                    pass
+                else:
+                    raise ValueError(f"{path}:{number}: Unknown record type {kind:02X}.")
+
+        # Merge adjacent records into contiguous regions.
+        regions = []
+        for address, payload in sorted(chunks, key=lambda chunk: chunk[0]):
+            if regions and regions[-1][0] + len(regions[-1][1]) == address:
+                regions[-1][1].extend(payload)
+            elif regions and regions[-1][0] + len(regions[-1][1]) > address:
+                raise ValueError(f"{path}: Overlapping data at 0x{address:08X}.")
+            else:
+                regions.append((address, bytearray(payload)))
+        return [(address, bytes(data)) for address, data in regions]
+
+    def __len__(self):
+        """
+        Number of data bytes in the image.
+        """
+        return sum(len(data) for _, data in self.regions)
@@ -1,30 +1,144 @@
+import collections
 import time        
 import plotly.graph_objs as go
+from IPython.display import display
+import numpy as np
 def update_vline_position(fig, old_x, new_x):
     for shape in fig.layout.shapes:
         if shape.type == 'line' and shape.x0 == old_x and shape.x1 == old_x:
             shape.update(x0=new_x, x1=new_x)
             break
 
+def minmax_downsample(data, buckets):
+    """
+    Shape-preserving downsampling of a trace: The trace is split into buckets and
+    only the minimum and maximum of every bucket are kept, in their original order.
+    Narrow features like crowbar dips stay visible, unlike with plain decimation.
+
+    Returns (indices, values) of the kept samples, at most 2 * buckets of them.
+
+    :param data: The trace.
+    :param buckets: The number of buckets.
+    """
+    data = np.asarray(data)
+    length = len(data)
+    if length <= 2 * buckets:
+        return np.arange(length), data
+    size = -(-length // buckets)
+    count = length // size
+    body = data[:count * size].reshape(count, size)
+    minimum = body.argmin(axis=1)
+    maximum = body.argmax(axis=1)
+    offsets = np.arange(count) * size
+    indices = np.column_stack((np.minimum(minimum, maximum) + offsets, np.maximum(minimum, maximum) + offsets)).ravel()
+    if count * size < length:
+        tail = data[count * size:]
+        tail_indices = sorted((int(tail.argmin()), int(tail.argmax())))
+        indices = np.concatenate((indices, np.array(tail_indices) + count * size))
+    # Flat buckets have the same minimum and maximum.
+    indices = np.unique(indices)
+    return indices, data[indices]
+
 class LivePlot:
-    def __init__(self):
-        self.fig = go.FigureWidget(data=[go.Scatter(y=[])])
+    def __init__(self, max_points=600, envelope=0, min_interval=0):
+        """
+        Initializes the LivePlot.
+
+        Traces are min/max downsampled to max_points before they are sent to the
+        browser, so a 30000 sample ADC trace is transferred as 600 points by default.
+
+        :param max_points: Number of points per trace sent to the browser, or None to send all samples.
+        :param envelope: Also draw the min/max envelope of the last envelope traces as shaded band, 0 to disable.
+        :param min_interval: Minimum seconds between two redraws. Updates are also skipped
+                             while the previous redraw took longer than the time since then,
+                             so a lagging frontend does not slow down the caller.
+        """
+        self.max_points = max_points
+        self.min_interval = min_interval
+        data = [go.Scatter(y=[], name="Trace", showlegend=False)]
+        if envelope:
+            data.insert(0, go.Scatter(y=[], mode="lines", line=dict(width=0), hoverinfo="skip", showlegend=False))
+            data.insert(1, go.Scatter(y=[], mode="lines", line=dict(width=0), fill="tonexty", hoverinfo="skip",
+                                      fillcolor="rgba(99, 110, 250, 0.2)", showlegend=False))
+        self.fig = go.FigureWidget(data=data)
         self.fig.update_layout(yaxis=dict(range=[0, 1]))
         self.fig.update_layout(
             margin=dict(l=20, r=20, t=20, b=20),
         )
         # vline = self.fig.add_vline(x=200, line_width=1, line_dash="dash", line_color="red")
         self.vline_x = 200
+        self.y_max = 1
+        # Per-bucket minima and maxima of the recent traces.
+        self._envelope = collections.deque(maxlen=envelope) if envelope else None
+        self._pending = None
+        self._last_draw = 0
+        self._draw_time = 0
+        self.skipped = 0
         display(self.fig)
     
-    def update(self, data):
+    def update(self, data, force=False):
         """
-        Updates the live figure.
+        Updates the live figure. Returns whether the figure was redrawn, skipped
+        traces still count towards the envelope and are drawn by flush().
 
-        :param data: Takes the data in the format [5, 3, 2, 1, ...]
+        :param data: Takes the data in the format [5, 3, 2, 1, ...], either scaled
+                     to 0..1 or as raw uint8 samples as returned by read_adc().
+        :param force: Redraw even if the update would be skipped.
+        """
+        data = np.asarray(data)
+        if self._envelope is not None:
+            self._envelope.append(self._bucket_extremes(data))
+
+        now = time.time()
+        elapsed = now - self._last_draw
+        if not force and (elapsed < self.min_interval or elapsed < self._draw_time):
+            self._pending = data
+            self.skipped += 1
+            return False
+        self._draw(data)
+        self._draw_time = time.time() - now
+        self._last_draw = now
+        return True
+
+    def flush(self):
+        """
+        Draws the last skipped trace, if any.
         """
+        if self._pending is not None:
+            self.update(self._pending, force=True)
 
-        self.fig.data[0].y = data
+    def _bucket_extremes(self, data):
+        buckets = min(self.max_points // 2 if self.max_points else len(data), len(data))
+        size = -(-len(data) // buckets) if buckets else 1
+        count = -(-len(data) // size) if len(data) else 0
+        padded = np.pad(data, (0, count * size - len(data)), mode="edge").reshape(count, size)
+        return size, padded.min(axis=1), padded.max(axis=1)
+
+    def _draw(self, data):
+        self._pending = None
+        y_max = 255 if data.dtype == np.uint8 else 1
+        with self.fig.batch_update():
+            if y_max != self.y_max:
+                self.fig.update_layout(yaxis=dict(range=[0, y_max]))
+                self.y_max = y_max
+            if self.max_points:
+                x, y = minmax_downsample(data, self.max_points // 2)
+                self.fig.data[-1].x = x
+                self.fig.data[-1].y = y
+            else:
+                self.fig.data[-1].x = None
+                self.fig.data[-1].y = data
+            if self._envelope:
+                size, lower, upper = self._envelope[-1]
+                for _, other_lower, other_upper in self._envelope:
+                    if len(other_lower) == len(lower):
+                        lower = np.minimum(lower, other_lower)
+                        upper = np.maximum(upper, other_upper)
+                x = np.arange(len(lower)) * size + size // 2
+                self.fig.data[0].x = x
+                self.fig.data[0].y = lower
+                self.fig.data[1].x = x
+                self.fig.data[1].y = upper
 
     def update_vline(self, x):
         """
@@ -74,22 +188,41 @@ class LiveMarkerPlotOld:
 
 
 class LiveMarkerPlot:
-    def __init__(self, gdc, x_range=None, y_range=None):
+    def __init__(self, gdc, x_range=None, y_range=None, max_points=10000, webgl=True):
         """
         Initializes the LiveMarkerPlot.
 
+        Updates are incremental: Only points added to the collection since the last
+        update are processed, identical (delay, pulse) points are merged into one
+        marker, and only the new markers are sent to the browser, as an additional
+        trace of their category. These traces are merged pairwise once they reach
+        the size of the previous one, so a category has only a few of them and
+        every marker is resent only a few times.
+
+        If a category has more than max_points distinct points, an evenly spread
+        subset is shown: Only every n-th distinct point is drawn, and n doubles
+        whenever the markers would exceed max_points.
+
         :param gdc: The data collection object.
         :param x_range: The range for the x-axis as a tuple (min, max), or None to auto-scale.
         :param y_range: The range for the y-axis as a tuple (min, max), or None to auto-scale.
+        :param max_points: Maximum number of markers per category, or None to show all distinct points.
+        :param webgl: Render with WebGL (Scattergl) traces, which stay fast with many markers.
         """
         self.gdc = gdc
+        self.max_points = max_points
 
+        self._scatter = go.Scattergl if webgl else go.Scatter
         figure_widget_data = []
+        # Category code of each category trace, in trace order.
+        self._trace_codes = []
         for key in gdc.data:
             if gdc.data[key].render:
                 figure_widget_data.append(
-                    go.Scatter(x=[], y=[], mode="markers", name=gdc.data[key].name, marker_color=gdc.data[key].color),
+                    self._scatter(x=[], y=[], mode="markers", name=gdc.data[key].name, marker_color=gdc.data[key].color,
+                                  legendgroup=str(key)),
                 )
+                self._trace_codes.append(gdc.data[key]._code)
 
         self.fig = go.FigureWidget(data=figure_widget_data)
 
@@ -107,10 +240,88 @@ class LiveMarkerPlot:
         self.fig.update_layout(**layout_options)
         self.vline_x = 200
         self.last_update = time.time()
+        # The traces of every category, the first one is shown in the legend.
+        self._chunks = [[trace] for trace in self.fig.data]
+        self._reset()
         display(self.fig)
 
+    def _reset(self):
+        # Number of collection points already processed. Per category the distinct
+        # points seen so far, packed as (delay << 32 | pulse), their number, every
+        # how many of them is drawn and the number of markers.
+        self._processed = 0
+        self._seen = [set() for _ in self._trace_codes]
+        self._distinct = [0] * len(self._trace_codes)
+        self._stride = [1] * len(self._trace_codes)
+        self._shown = [0] * len(self._trace_codes)
+        for chunks in self._chunks:
+            self._remove_traces(chunks[1:])
+            del chunks[1:]
+            chunks[0].x = []
+            chunks[0].y = []
+
+    def _remove_traces(self, traces):
+        if traces:
+            self.fig.data = [trace for trace in self.fig.data if not any(trace is removed for removed in traces)]
+
+    @staticmethod
+    def _concatenate(traces, axis):
+        return np.concatenate([np.asarray(getattr(trace, axis), dtype=np.int64) for trace in traces])
+
+    def _thin(self, i):
+        # Drawn are the distinct points 0, stride, 2 * stride, ..., in order, so
+        # doubling the stride keeps every other marker.
+        chunks = self._chunks[i]
+        x = self._concatenate(chunks, "x")[::2]
+        y = self._concatenate(chunks, "y")[::2]
+        self._remove_traces(chunks[1:])
+        del chunks[1:]
+        with self.fig.batch_update():
+            chunks[0].x = x
+            chunks[0].y = y
+        self._stride[i] *= 2
+        self._shown[i] = len(x)
+
+    def _add_markers(self, i, packed):
+        seen = self._seen[i]
+        fresh = [point for point in np.unique(packed).tolist() if point not in seen]
+        if not fresh:
+            # Only duplicates of points that are already known.
+            return
+        seen.update(fresh)
+        first = self._distinct[i]
+        self._distinct[i] += len(fresh)
+        while True:
+            stride = self._stride[i]
+            selected = fresh[(-first) % stride::stride]
+            if not self.max_points or self._shown[i] + len(selected) <= self.max_points:
+                break
+            self._thin(i)
+        if not selected:
+            return
+        selected = np.array(selected, dtype=np.int64)
+        x = selected >> 32
+        y = (selected & 0xFFFFFFFF).astype(np.uint32).astype(np.int32)
+        chunks = self._chunks[i]
+        base = chunks[0]
+        if self._shown[i] == 0:
+            with self.fig.batch_update():
+                base.x = x
+                base.y = y
+        else:
+            self.fig.add_trace(self._scatter(x=x, y=y, mode="markers", name=base.name, marker_color=base.marker.color,
+                                             legendgroup=base.legendgroup, showlegend=False))
+            chunks.append(self.fig.data[-1])
+            # Merge the last traces while the new one is at least as large as the
+            # one before, like a binary counter.
+            while len(chunks) > 1 and len(chunks[-2].x) <= len(chunks[-1].x):
+                last = chunks.pop()
+                with self.fig.batch_update():
+                    chunks[-1].x = self._concatenate((chunks[-1], last), "x")
+                    chunks[-1].y = self._concatenate((chunks[-1], last), "y")
+                self._remove_traces([last])
+        self._shown[i] += len(x)
 
-    
     def slow_update(self):
         if((time.time() - self.last_update) < 3):
             return
@@ -118,18 +329,18 @@ class LiveMarkerPlot:
 
     def update(self):
         """
-        Updates the live figure.
-
-        :param data: Takes the scatters in the format [[4000, 8], [3950, 4]]
+        Updates the live figure with the points added to the collection since the last update.
         """
         self.last_update = time.time()
-        i = 0
-        for k in self.gdc.data:
-            data = self.gdc.get_data(k)
-            if not data.render:
-                continue
-            x_values = data.delays
-            y_values = data.pulses
-            self.fig.data[i].x = x_values
-            self.fig.data[i].y = y_values
-            i += 1
+        if len(self.gdc) < self._processed:
+            # The collection was replaced or reset, start over.
+            self._reset()
+        delays, pulses, codes = self.gdc.rows(self._processed)
+        self._processed += len(codes)
+        if len(codes) == 0:
+            return
+        packed = (delays.astype(np.int64) << 32) | (pulses.astype(np.int64) & 0xFFFFFFFF)
+        for i, code in enumerate(self._trace_codes):
+            new = packed[codes == code]
+            if len(new):
+                self._add_markers(i, new)
@@ -0,0 +1,259 @@
+import os
+import socket
+import subprocess
+import tempfile
+import time
+from .IntelHex import HexImage
+
+"""
+    A long-running OpenOCD process, driven over its Tcl RPC port. The probe
+    and target are initialized once, after that every operation is a single
+    round-trip on localhost instead of a new OpenOCD process, i.e. checking
+    the APPROTECT status of an nRF52 takes milliseconds instead of seconds.
+"""
+
+# Terminates every command and response on the Tcl RPC port.
+TCL_TERMINATOR = b"\x1a"
+
+class OpenOCDError(Exception):
+    pass
+
+class OpenOCDSession:
+    """
+    Example::
+
+        with OpenOCDSession() as session:
+            Faultier.lock_and_flash_nrf("firmware.hex", session=session)
+            for delay in ...:
+                f.glitch(delay, 10)
+                if not session.check_nrf_lock():
+                    print("Unlocked!")
+
+    :param configs: The OpenOCD configuration files (-f) to start OpenOCD with.
+
+    :param port: The Tcl RPC port. When spawning OpenOCD, a free port is used if None.
+
+    :param host: The host OpenOCD listens on.
+
+    :param spawn: Start OpenOCD. If False, connect to an OpenOCD that is already
+                  running with its Tcl port enabled (port defaults to 6666 then).
+
+    :param openocd: The OpenOCD executable.
+
+    :param timeout: Seconds to wait for the response to a command.
+
+    :param startup_timeout: Seconds to wait for a spawned OpenOCD to accept connections.
+
+    :param dap: The DAP of the target, used by check_nrf_lock.
+    """
+    def __init__(self, configs=("interface/tamarin.cfg", "target/nrf52.cfg"), port=None, host="127.0.0.1",
+                 spawn=True, openocd="openocd", timeout=30, startup_timeout=10, dap="nrf52.dap"):
+        self.host = host
+        self.timeout = timeout
+        self.dap = dap
+        self.process = None
+        self.log = None
+        self.socket = None
+        self._buffer = b""
+        # HexImage digest of the image this session last programmed, None if unknown.
+        self.programmed = None
+        if spawn:
+            if port is None:
+                port = self._free_port()
+            self.log = tempfile.TemporaryFile()
+            cmd = [openocd]
+            for config in configs:
+                cmd += ["-f", config]
+            cmd += ["-c", f"tcl_port {port}", "-c", "telnet_port disabled", "-c", "gdb_port disabled"]
+            self.process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=self.log, stderr=subprocess.STDOUT)
+        elif port is None:
+            port = 6666
+        self.port = port
+        self._connect(startup_timeout)
+
+    @staticmethod
+    def _free_port():
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            return s.getsockname()[1]
+
+    def _connect(self, startup_timeout):
+        deadline = time.time() + startup_timeout
+        while True:
+            try:
+                self.socket = socket.create_connection((self.host, self.port), timeout=self.timeout)
+                self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                return
+            except OSError as e:
+                if self.process is not None and self.process.poll() is not None:
+                    raise OpenOCDError(f"OpenOCD exited with code {self.process.returncode}:\n{self.output()}")
+                if time.time() > deadline:
+                    self.close()
+                    raise OpenOCDError(f"Could not connect to OpenOCD on {self.host}:{self.port}: {e}")
+                time.sleep(0.05)
+
+    def output(self):
+        """
+        Returns everything a spawned OpenOCD printed so far.
+        """
+        if self.log is None:
+            return ""
+        self.log.seek(0)
+        return self.log.read().decode("utf-8", "replace")
+
+    def command(self, command):
+        """
+        Runs a Tcl command and returns its result. Note that the result does not
+        include what the command prints, use capture() for that.
+        """
+        if self.socket is None:
+            raise OpenOCDError("Session is closed.")
+        if TCL_TERMINATOR.decode() in command:
+            raise ValueError("Command must not contain the Tcl RPC terminator.")
+        self.socket.sendall(command.encode("utf-8") + TCL_TERMINATOR)
+        while TCL_TERMINATOR not in self._buffer:
+            data = self.socket.recv(65536)
+            if not data:
+                raise OpenOCDError("OpenOCD closed the connection.")
+            self._buffer += data
+        response, self._buffer = self._buffer.split(TCL_TERMINATOR, 1)
+        return response.decode("utf-8", "replace")
+
+    def capture(self, command):
+        """
+        Runs an OpenOCD command and returns what it printed. Raises an OpenOCDError
+        if the command fails.
+        """
+        response = self.command(f"set _faultier_rc [catch {{capture {{{command}}}}} _faultier_out]; format \"%d %s\" $_faultier_rc $_faultier_out")
+        code, _, output = response.partition(" ")
+        if code != "0":
+            raise OpenOCDError(f"{command} failed: {output.strip()}")
+        return output
+
+    def _check_path(self, path):
+        if not os.path.isfile(path):
+            raise Exception(f"File {path} not found.")
+        if any(c in path for c in "{}\\"):
+            raise Exception("Path contains braces or backslashes - unsupported.")
+
+    def program(self, path, verify=True, recover=False, reset=True):
+        """
+        Programs a firmware image. Returns the OpenOCD output.
+
+        :param recover: Mass-erase and unlock an nRF52 with nrf52_recover first.
+        """
+        self._check_path(path)
+        image = HexImage(path) if path.lower().endswith(".hex") else None
+        output = ""
+        if recover:
+            output += self.unlock_nrf()
+        self.programmed = None
+        output += self.capture(f"program {{{path}}}{' verify' if verify else ''}")
+        if verify and "Verified OK" not in output:
+            raise OpenOCDError(f"Verification failed:\n{output}")
+        if image is not None:
+            self.programmed = image.digest
+        if reset:
+            output += self.reset()
+        return output
+
+    def reset(self, locked=False):
+        """
+        Resets the target. Returns the OpenOCD output.
+
+        :param locked: The nRF52 has APPROTECT enabled. It is then reset through the
+                       RESET register of its CTRL-AP, as the memory access port
+                       OpenOCD normally resets through is not accessible.
+        """
+        if locked:
+            return self.capture(f"{self.dap} apreg 1 0x000 1; {self.dap} apreg 1 0x000 0")
+        return self.capture("reset")
+
+    def verify_image(self, path):
+        """
+        Returns whether the target memory matches the image. OpenOCD compares a
+        CRC of every section, computed on the target, so nothing is read back
+        unless the target has no checksum algorithm. False on locked chips.
+        """
+        self._check_path(path)
+        try:
+            output = self.capture(f"verify_image_checksum {{{path}}}")
+        except OpenOCDError:
+            return False
+        return "mismatch" not in output
+
+    def image_unchanged(self, path, locked=None):
+        """
+        Returns whether the target already holds the Intel HEX image at path.
+        An unlocked chip is compared with verify_image_checksum. A locked chip
+        cannot be read, so for it this only relies on bookkeeping: It counts as
+        unchanged if this session programmed an image with the same HexImage
+        digest and did not erase the chip since. Changes made to the flash by
+        other means (i.e. the firmware itself) are not noticed then.
+
+        :param locked: The result of check_nrf_lock, checked if None.
+        """
+        if locked is None:
+            locked = self.check_nrf_lock()
+        if locked:
+            return self.programmed is not None and self.programmed == HexImage(path).digest
+        return self.verify_image(path)
+
+    def check_nrf_lock(self):
+        """
+        Returns whether the nRF52 has APPROTECT enabled, by reading the APPROTECTSTATUS
+        register of its CTRL-AP. Works on locked chips, too.
+        """
+        command = f"{self.dap} apreg 1 0x0c"
+        # Depending on the OpenOCD version, the value is printed or returned as result.
+        value = self.capture(command).strip() or self.command(command).strip()
+        try:
+            status = int(value.split()[-1], 0)
+        except (ValueError, IndexError):
+            raise OpenOCDError(f"Unexpected APPROTECTSTATUS: {value}")
+        # Bit 0 is set while the access port protection is disabled.
+        return not status & 1
+
+    def lock_nrf(self, reset=True):
+        """
+        Enables APPROTECT by writing UICR.APPROTECT, effective after the next reset.
+        """
+        self.capture("flash fillw 0x10001208 0xFFFFFF00 0x01")
+        if reset:
+            self.reset()
+
+    def unlock_nrf(self):
+        """
+        Unlocks the nRF52 by erasing it with nrf52_recover.
+        """
+        self.programmed = None
+        return self.capture("nrf52_recover")
+
+    def close(self):
+        """
+        Closes the connection and shuts down a spawned OpenOCD.
+        """
+        if self.socket is not None:
+            if self.process is not None:
+                try:
+                    self.socket.sendall(b"shutdown" + TCL_TERMINATOR)
+                except OSError:
+                    pass
+            self.socket.close()
+            self.socket = None
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process = None
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,243 @@
+import random
+import numpy as np
+
+"""
+    Visits every combination of several glitch parameters exactly once, in an
+    order that spreads evenly over the joint space from the start. The order is
+    a keyed Feistel permutation of the combination indices, restricted to the
+    size of the space by cycle walking, so it needs constant memory and works
+    for spaces far larger than 2**32.
+"""
+
+MASK64 = (1 << 64) - 1
+
+def _mix64(x):
+    # splitmix64 finalizer
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+def _mix64_array(x):
+    # Same as _mix64 for numpy uint64 arrays, multiplications wrap around.
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+class ParameterSampler:
+    """
+    Example::
+
+        sampler = ParameterSampler({
+            "delay": range(1000, 5000),
+            "pulse": range(1, 50),
+            "power_cycle_length": [1000, 3000, 10000],
+        }, seed=42)
+        for delay, pulse, power_cycle_length in sampler:
+            f.configure_glitcher(power_cycle_length=power_cycle_length, ...)
+            f.glitch(delay, pulse)
+
+    Seeking, sharding and checkpointing work like with RandomOrderGenerator.
+
+    :param dimensions: Dict of dimension name to the values of the dimension (a range or a list).
+
+    :param seed: Seed for the permutation. The same seed always produces the same order.
+                 If None, the global random module is used.
+
+    :param rounds: Number of Feistel rounds.
+    """
+    def __init__(self, dimensions, seed=None, rounds=4):
+        self.names = list(dimensions)
+        self.dimensions = [dimensions[name] for name in self.names]
+        self.n = 1
+        for values in self.dimensions:
+            self.n *= len(values)
+        if self.n == 0:
+            raise ValueError("All dimensions must have at least one value.")
+        rng = random.Random(seed) if seed is not None else random
+        self.seed = seed
+        self.keys = [rng.getrandbits(64) for _ in range(rounds)]
+        self.current_x = 0
+        self.offset = 0
+        self.stride = 1
+        self.length = self.n
+        self._setup()
+
+    def _setup(self):
+        # Feistel network over the smallest even number of bits that covers n.
+        self._half_bits = max(((self.n - 1).bit_length() + 1) // 2, 1)
+        self._half_mask = (1 << self._half_bits) - 1
+
+    def _round(self, value, key):
+        h = key
+        while True:
+            h = _mix64(h ^ (value & MASK64))
+            value >>= 64
+            if not value:
+                break
+        result = h
+        bits = 64
+        while bits < self._half_bits:
+            h = _mix64(h)
+            result = (result << 64) | h
+            bits += 64
+        return result & self._half_mask
+
+    def permute(self, index):
+        """
+        Returns the combination index at position index of the order.
+        """
+        x = index
+        while True:
+            left = x >> self._half_bits
+            right = x & self._half_mask
+            for key in self.keys:
+                left, right = right, left ^ self._round(right, key)
+            x = (left << self._half_bits) | right
+            # Cycle walking: Values outside of the space are permuted again until
+            # they fall inside, which keeps the permutation bijective on [0, n).
+            if x < self.n:
+                return x
+
+    def _permute_array(self, indices):
+        x = indices.copy()
+        todo = np.arange(len(x))
+        half = np.uint64(self._half_bits)
+        mask = np.uint64(self._half_mask)
+        n = np.uint64(self.n)
+        while len(todo):
+            left = x[todo] >> half
+            right = x[todo] & mask
+            for key in self.keys:
+                left, right = right, left ^ (_mix64_array(np.uint64(key) ^ right) & mask)
+            x[todo] = (left << half) | right
+            todo = todo[x[todo] >= n]
+        return x
+
+    def combination(self, index):
+        """
+        Returns the tuple of parameter values of a combination index.
+        """
+        values = []
+        for dimension in reversed(self.dimensions):
+            index, i = divmod(index, len(dimension))
+            values.append(dimension[i])
+        return tuple(reversed(values))
+
+    def value_at(self, index):
+        """
+        Returns the parameter tuple at position index of the order.
+        """
+        return self.combination(self.permute(self.offset + index * self.stride))
+
+    def next_value(self):
+        if self.current_x >= self.length:
+            raise StopIteration("All values have been visited")
+        value = self.value_at(self.current_x)
+        self.current_x += 1
+        return value
+
+    def next_block(self, k):
+        """
+        Returns the next k parameter tuples as (k, dimensions) numpy array. The
+        array is shorter once the end of the order is reached, and empty afterwards.
+        """
+        count = max(min(k, self.length - self.current_x), 0)
+        first = self.current_x
+        self.current_x += count
+        if self._half_bits > 32:
+            return np.array([self.value_at(x) for x in range(first, first + count)]).reshape(count, len(self.dimensions))
+        indices = self._permute_array(np.arange(first, first + count, dtype=np.uint64) * np.uint64(self.stride) + np.uint64(self.offset))
+        columns = []
+        for dimension in reversed(self.dimensions):
+            size = np.uint64(len(dimension))
+            positions = (indices % size).astype(np.int64)
+            indices = indices // size
+            if isinstance(dimension, range):
+                columns.append(dimension.start + positions * dimension.step)
+            else:
+                columns.append(np.asarray(dimension)[positions])
+        return np.column_stack(columns[::-1]) if columns else np.zeros((count, 0))
+
+    def seek(self, index):
+        """
+        Continues the order at position index, 0 starts over with the same order.
+        """
+        if index < 0 or index > self.length:
+            raise ValueError(f"Index must be between 0 and {self.length}. Provided {index}.")
+        self.current_x = index
+
+    def skip(self, k):
+        """
+        Skips the next k values.
+        """
+        self.seek(min(self.current_x + k, self.length))
+
+    def __iter__(self):
+        while self.current_x < self.length:
+            yield self.next_value()
+
+    def __len__(self):
+        return self.length
+
+    def shard(self, num_shards, index):
+        """
+        Returns a sampler for shard index of num_shards disjoint shards of this
+        order, see RandomOrderGenerator.shard.
+        """
+        if num_shards < 1:
+            raise ValueError(f"Number of shards must be at least 1. Provided {num_shards}.")
+        if index < 0 or index >= num_shards:
+            raise ValueError(f"Shard index must be between 0 and {num_shards - 1}. Provided {index}.")
+        state = self.get_state()
+        state["offset"] = self.offset + index * self.stride
+        state["stride"] = self.stride * num_shards
+        state["length"] = max(-(-(self.length - index) // num_shards), 0)
+        state["position"] = 0
+        return ParameterSampler.from_state(state)
+
+    def get_state(self):
+        """
+        Returns the complete state as JSON-serializable dict, to checkpoint a sweep
+        and continue it later with from_state().
+        """
+        dimensions = {}
+        for name, values in zip(self.names, self.dimensions):
+            if isinstance(values, range):
+                dimensions[name] = {"range": [values.start, values.stop, values.step]}
+            else:
+                dimensions[name] = list(values)
+        return {
+            "dimensions": dimensions,
+            "seed": self.seed,
+            "keys": self.keys,
+            "offset": self.offset,
+            "stride": self.stride,
+            "length": self.length,
+            "position": self.current_x,
+        }
+
+    @staticmethod
+    def from_state(state):
+        """
+        Creates a sampler from a state returned by get_state().
+        """
+        sampler = ParameterSampler.__new__(ParameterSampler)
+        sampler.names = list(state["dimensions"])
+        sampler.dimensions = []
+        for values in state["dimensions"].values():
+            if isinstance(values, dict):
+                values = range(*values["range"])
+            sampler.dimensions.append(values)
+        sampler.n = 1
+        for values in sampler.dimensions:
+            sampler.n *= len(values)
+        sampler.seed = state["seed"]
+        sampler.keys = list(state["keys"])
+        sampler.offset = state["offset"]
+        sampler.stride = state["stride"]
+        sampler.length = state["length"]
+        sampler.current_x = state["position"]
+        sampler._setup()
+        return sampler
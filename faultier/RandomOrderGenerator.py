@@ -1,31 +1,156 @@
 import random
 from math import gcd
+import numpy as np
 
 class RandomOrderGenerator:
-    def __init__(self, start, end):
+    """
+    Visits every value in [start, end) exactly once in a pseudo-random order,
+    using the permutation x -> (a * x + b) mod n. As the permutation is affine,
+    the value at any index can be computed directly, which makes seeking and
+    generating blocks of values cheap.
+
+    To split a sweep across several Faultiers, create the generator with the same
+    seed on every worker and use shard(), i.e.
+    RandomOrderGenerator(0, 10000, seed=42).shard(4, worker_index).
+
+    :param start: First value of the range.
+
+    :param end: End of the range, exclusive.
+
+    :param seed: Seed for a and b. The same seed always produces the same order.
+                 If None, the global random module is used.
+    """
+    def __init__(self, start, end, seed=None):
         self.n = end - start
         self.start = start
+        self.seed = seed
+        self._random = random.Random(seed) if seed is not None else random
         self.a = self.find_coprime_a()
-        self.b = random.randint(0, self.n-1)
+        self.b = self._random.randint(0, self.n-1)
         self.current_x = 0
+        # This generator visits the indices offset, offset + stride, ... of the
+        # permutation, length of them. Only shards use a stride other than 1.
+        self.offset = 0
+        self.stride = 1
+        self.length = self.n
 
     def find_coprime_a(self):
         # Try to find a coprime number in [n/2, n) and limit the search to 100,000 attempts to ensure fast execution
         attempts = 0
         while attempts < 1000000:
-            candidate = random.randint(self.n // 2, self.n - 1)
+            candidate = self._random.randint(self.n // 2, self.n - 1)
             if gcd(candidate, self.n) == 1:
                 return candidate
             attempts += 1
         raise ValueError("Failed to find a coprime number within 1,000,000 attempts")
 
+    def value_at(self, index):
+        """
+        Returns the value at position index of the order.
+        """
+        return self.start + (self.a * (self.offset + index * self.stride) + self.b) % self.n
+
     def next_value(self):
-        if self.current_x >= self.n:
+        if self.current_x >= self.length:
             raise StopIteration("All values have been visited")
-        value = (self.a * self.current_x + self.b) % self.n
+        value = self.value_at(self.current_x)
         self.current_x += 1
-        return self.start + value
+        return value
+
+    def next_block(self, k):
+        """
+        Returns the next k values as numpy array. The array is shorter once
+        the end of the order is reached, and empty afterwards.
+        """
+        count = max(min(k, self.length - self.current_x), 0)
+        first = self.current_x
+        self.current_x += count
+        if self.n <= 2**32:
+            # a * x + b stays below n * n, which fits into 64 bits.
+            x = np.arange(first, first + count, dtype=np.uint64) * np.uint64(self.stride) + np.uint64(self.offset)
+            values = (np.uint64(self.a) * x + np.uint64(self.b)) % np.uint64(self.n)
+            return values.astype(np.int64) + self.start
+        return np.array([self.value_at(x) for x in range(first, first + count)], dtype=object)
+
+    def seek(self, index):
+        """
+        Continues the order at position index, 0 starts over with the same order.
+        """
+        if index < 0 or index > self.length:
+            raise ValueError(f"Index must be between 0 and {self.length}. Provided {index}.")
+        self.current_x = index
+
+    def skip(self, k):
+        """
+        Skips the next k values.
+        """
+        self.seek(min(self.current_x + k, self.length))
+
+    def __iter__(self):
+        while self.current_x < self.length:
+            yield self.next_value()
+
+    def __len__(self):
+        return self.length
+
+    def shard(self, num_shards, index):
+        """
+        Returns a generator for shard index of num_shards disjoint shards of this
+        order. Together, the shards visit every value exactly once. The shard starts
+        at its beginning, independent of the position of this generator.
+
+        :param num_shards: The total number of shards, i.e. the number of workers.
+
+        :param index: The shard to return, 0 <= index < num_shards.
+        """
+        if num_shards < 1:
+            raise ValueError(f"Number of shards must be at least 1. Provided {num_shards}.")
+        if index < 0 or index >= num_shards:
+            raise ValueError(f"Shard index must be between 0 and {num_shards - 1}. Provided {index}.")
+        state = self.get_state()
+        state["offset"] = self.offset + index * self.stride
+        state["stride"] = self.stride * num_shards
+        state["length"] = max(-(-(self.length - index) // num_shards), 0)
+        state["position"] = 0
+        return RandomOrderGenerator.from_state(state)
+
+    def get_state(self):
+        """
+        Returns the complete state as JSON-serializable dict, to checkpoint a sweep
+        and continue it later with from_state().
+        """
+        return {
+            "start": self.start,
+            "n": self.n,
+            "seed": self.seed,
+            "a": self.a,
+            "b": self.b,
+            "offset": self.offset,
+            "stride": self.stride,
+            "length": self.length,
+            "position": self.current_x,
+        }
+
+    @staticmethod
+    def from_state(state):
+        """
+        Creates a generator from a state returned by get_state().
+        """
+        generator = RandomOrderGenerator.__new__(RandomOrderGenerator)
+        generator.start = state["start"]
+        generator.n = state["n"]
+        generator.seed = state["seed"]
+        generator._random = random.Random(generator.seed) if generator.seed is not None else random
+        generator.a = state["a"]
+        generator.b = state["b"]
+        generator.offset = state["offset"]
+        generator.stride = state["stride"]
+        generator.length = state["length"]
+        generator.current_x = state["position"]
+        return generator
 
     def reset(self):
+        # Note that a new b is a different order, shards of the old order are
+        # no longer disjoint with this one. Use seek(0) to start over instead.
         self.current_x = 0
-        self.b = random.randint(0, self.n-1)
+        self.b = self._random.randint(0, self.n-1)
@@ -0,0 +1,278 @@
+import numpy as np
+# Imported through the package, see __init__.py.
+from . import RandomOrderGenerator, AdaptiveSearch
+
+"""
+    Offline comparison of glitch parameter search strategies. A FaultLandscape
+    models the probabilities of success and reset as functions of delay and
+    pulse, and the harness runs strategies against it over many seeds, reporting
+    the number of attempts until the first and until N successes.
+
+    Example::
+
+        landscape = FaultLandscape.bands((1000, 5000), (1, 50), seed=1)
+        compare_strategies({
+            "random": RandomOrderStrategy,
+            "grid": GridStrategy,
+            "coarse-to-fine": CoarseToFineStrategy,
+            "adaptive": AdaptiveStrategy,
+        }, landscape, successes=10, seeds=range(20))
+
+    A strategy is any object with propose() returning (delay, pulse) and
+    observe(key, delay, pulse), created by a factory called as
+    factory(landscape, seed). AdaptiveSearch works as is.
+"""
+
+SUCCESS = "success"
+RESET = "reset"
+NOTHING = "nothing"
+
+class FaultLandscape:
+    """
+    :param delay_range: (start, end) of the delays, end is exclusive.
+
+    :param pulse_range: (start, end) of the pulses, end is exclusive.
+
+    :param success: Function (delays, pulses) -> success probabilities, called with numpy arrays.
+
+    :param reset: Function (delays, pulses) -> reset probabilities, called with numpy arrays.
+                  A reset takes precedence over a success.
+
+    :param jitter: Standard deviation of the trigger jitter in delay units. The
+                   delay the target actually sees is shifted by it on every attempt.
+
+    :param pulse_jitter: Standard deviation of the effective pulse length.
+    """
+    def __init__(self, delay_range, pulse_range, success=None, reset=None, jitter=0, pulse_jitter=0):
+        self.delay_range = delay_range
+        self.pulse_range = pulse_range
+        self.success = success
+        self.reset = reset
+        self.jitter = jitter
+        self.pulse_jitter = pulse_jitter
+
+    @staticmethod
+    def bands(delay_range, pulse_range, count=2, delay_width=20, pulse_width=3, rate=0.2,
+              reset_pulse=None, reset_rate=0.9, jitter=5, pulse_jitter=0.5, seed=None):
+        """
+        A typical landscape: count narrow success bands at random positions, and
+        resets that get likely once the pulse is longer than reset_pulse (by
+        default 70% into the pulse range).
+
+        :param rate: Success probability in the center of a band.
+        """
+        rng = np.random.default_rng(seed)
+        centers = [(rng.uniform(delay_range[0] + delay_width, delay_range[1] - delay_width),
+                    rng.uniform(pulse_range[0] + pulse_width, pulse_range[0] + 0.7 * (pulse_range[1] - pulse_range[0])))
+                   for _ in range(count)]
+        if reset_pulse is None:
+            reset_pulse = pulse_range[0] + 0.7 * (pulse_range[1] - pulse_range[0])
+
+        def success(delays, pulses):
+            probability = np.zeros(np.shape(delays))
+            for delay, pulse in centers:
+                # Gaussian bump, sigma is half the band width.
+                distance = ((delays - delay) / (delay_width / 2)) ** 2 + ((pulses - pulse) / (pulse_width / 2)) ** 2
+                probability = np.maximum(probability, rate * np.exp(-distance / 2))
+            return probability
+
+        def reset(delays, pulses):
+            return reset_rate / (1 + np.exp(-(np.asarray(pulses) - reset_pulse)))
+
+        landscape = FaultLandscape(delay_range, pulse_range, success, reset, jitter, pulse_jitter)
+        landscape.centers = centers
+        return landscape
+
+    def probabilities(self, delays, pulses):
+        """
+        Returns the (success, reset) probabilities for the given delays and pulses, without jitter.
+        """
+        delays = np.asarray(delays, dtype=np.float64)
+        pulses = np.asarray(pulses, dtype=np.float64)
+        success = self.success(delays, pulses) if self.success else np.zeros(delays.shape)
+        reset = self.reset(delays, pulses) if self.reset else np.zeros(delays.shape)
+        return success, reset
+
+    def outcome(self, delay, pulse, rng):
+        """
+        Simulates a single glitch and returns SUCCESS, RESET or NOTHING.
+        """
+        if self.jitter:
+            delay = delay + rng.normal(0, self.jitter)
+        if self.pulse_jitter:
+            pulse = pulse + rng.normal(0, self.pulse_jitter)
+        success, reset = self.probabilities(delay, pulse)
+        draw = rng.random()
+        if draw < reset:
+            return RESET
+        if draw < reset + (1 - reset) * success:
+            return SUCCESS
+        return NOTHING
+
+class RandomOrderStrategy:
+    """
+    Visits the delay x pulse space in RandomOrderGenerator order, starting over when done.
+    """
+    def __init__(self, landscape, seed=None):
+        self.pulses = landscape.pulse_range[1] - landscape.pulse_range[0]
+        self.delay_start = landscape.delay_range[0]
+        self.pulse_start = landscape.pulse_range[0]
+        self.generator = RandomOrderGenerator(0, (landscape.delay_range[1] - landscape.delay_range[0]) * self.pulses, seed=seed)
+
+    def propose(self):
+        if self.generator.current_x >= self.generator.length:
+            self.generator.seek(0)
+        delay, pulse = divmod(self.generator.next_value(), self.pulses)
+        return self.delay_start + delay, self.pulse_start + pulse
+
+    def observe(self, key, delay, pulse):
+        pass
+
+class GridStrategy:
+    """
+    Sweeps delay-major over a grid, starting at a random offset.
+
+    :param delay_step: Distance between two delays of the grid.
+
+    :param pulse_step: Distance between two pulses of the grid.
+    """
+    def __init__(self, landscape, seed=None, delay_step=1, pulse_step=1):
+        self.points = [(delay, pulse)
+                       for delay in range(landscape.delay_range[0], landscape.delay_range[1], delay_step)
+                       for pulse in range(landscape.pulse_range[0], landscape.pulse_range[1], pulse_step)]
+        self.index = int(np.random.default_rng(seed).integers(len(self.points)))
+
+    def propose(self):
+        point = self.points[self.index]
+        self.index = (self.index + 1) % len(self.points)
+        return point
+
+    def observe(self, key, delay, pulse):
+        pass
+
+class CoarseToFineStrategy:
+    """
+    Sweeps a coarse grid in random order. Every success (and every reset when
+    refine_resets is set) queues the full-resolution neighbourhood of that point,
+    which is searched before the coarse sweep continues. Once the coarse grid is
+    done, it continues with a grid of half the step.
+
+    :param delay_step: Initial distance between two delays of the coarse grid.
+
+    :param pulse_step: Initial distance between two pulses of the coarse grid.
+    """
+    def __init__(self, landscape, seed=None, delay_step=16, pulse_step=4, refine_resets=False):
+        self.landscape = landscape
+        self.rng = np.random.default_rng(seed)
+        self.delay_step = delay_step
+        self.pulse_step = pulse_step
+        self.refine_resets = refine_resets
+        self.queue = []
+        self.refined = set()
+        self._coarse()
+
+    def _coarse(self):
+        self.grid = [(delay, pulse)
+                     for delay in range(self.landscape.delay_range[0], self.landscape.delay_range[1], self.delay_step)
+                     for pulse in range(self.landscape.pulse_range[0], self.landscape.pulse_range[1], self.pulse_step)]
+        self.rng.shuffle(self.grid)
+
+    def propose(self):
+        if self.queue:
+            return self.queue.pop()
+        if not self.grid:
+            self.delay_step = max(self.delay_step // 2, 1)
+            self.pulse_step = max(self.pulse_step // 2, 1)
+            self._coarse()
+        return self.grid.pop()
+
+    def observe(self, key, delay, pulse):
+        if key != SUCCESS and not (self.refine_resets and key == RESET):
+            return
+        cell = (delay // self.delay_step, pulse // self.pulse_step)
+        if cell in self.refined:
+            # Repeat the successful point, the neighbourhood is already queued.
+            self.queue.append((delay, pulse))
+            return
+        self.refined.add(cell)
+        neighbourhood = [(d, p)
+                         for d in range(max(delay - self.delay_step, self.landscape.delay_range[0]), min(delay + self.delay_step, self.landscape.delay_range[1]))
+                         for p in range(max(pulse - self.pulse_step, self.landscape.pulse_range[0]), min(pulse + self.pulse_step, self.landscape.pulse_range[1]))]
+        self.rng.shuffle(neighbourhood)
+        self.queue.extend(neighbourhood)
+
+def AdaptiveStrategy(landscape, seed=None, **kwargs):
+    """
+    AdaptiveSearch over the landscape, keyword arguments are passed on.
+    """
+    kwargs.setdefault("prior", (0.1, 10))
+    return AdaptiveSearch(landscape.delay_range, landscape.pulse_range, success_keys=[SUCCESS], seed=seed, **kwargs)
+
+def run_strategy(strategy, landscape, successes=10, max_attempts=100000, seed=None):
+    """
+    Runs a strategy until it found successes successes or max_attempts glitches
+    were spent. Returns (attempts to first success, attempts to successes successes),
+    either is None if it was not reached.
+    """
+    rng = np.random.default_rng(seed)
+    found = 0
+    first = None
+    for attempt in range(1, max_attempts + 1):
+        delay, pulse = strategy.propose()
+        key = landscape.outcome(delay, pulse, rng)
+        strategy.observe(key, delay, pulse)
+        if key == SUCCESS:
+            found += 1
+            if first is None:
+                first = attempt
+            if found >= successes:
+                return first, attempt
+    return first, None
+
+def simulate(factory, landscape, successes=10, max_attempts=100000, seeds=range(10)):
+    """
+    Runs the strategy created by factory(landscape, seed) once per seed and
+    returns a dict with the per-seed "first" and "n" attempt counts (None if
+    not reached) and their summary statistics.
+    """
+    first = []
+    n = []
+    for seed in seeds:
+        strategy = factory(landscape, seed)
+        # Different stream for the landscape than for the strategy.
+        result = run_strategy(strategy, landscape, successes, max_attempts, seed=(seed, 1))
+        first.append(result[0])
+        n.append(result[1])
+    return {"first": first, "n": n, "first_summary": _summary(first, max_attempts), "n_summary": _summary(n, max_attempts)}
+
+def _summary(values, max_attempts):
+    reached = np.array([value for value in values if value is not None], dtype=np.float64)
+    if len(reached) == 0:
+        return {"reached": 0, "runs": len(values), "median": None, "mean": None, "p90": None}
+    # Runs that did not get there count as max_attempts, so the statistics are lower bounds.
+    capped = np.array([max_attempts if value is None else value for value in values], dtype=np.float64)
+    return {
+        "reached": len(reached),
+        "runs": len(values),
+        "median": float(np.median(capped)),
+        "mean": float(capped.mean()),
+        "p90": float(np.percentile(capped, 90)),
+    }
+
+def compare_strategies(factories, landscape, successes=10, max_attempts=100000, seeds=range(10)):
+    """
+    Simulates every strategy of the dict name -> factory, prints a table and
+    returns the results by name.
+    """
+    results = {}
+    print(f"{'strategy':20} {'first (median)':>15} {'first (p90)':>12} {f'{successes} (median)':>15} {f'{successes} (p90)':>12} {'reached':>8}")
+    for name, factory in factories.items():
+        result = simulate(factory, landscape, successes, max_attempts, seeds)
+        results[name] = result
+        first = result["first_summary"]
+        n = result["n_summary"]
+        print(f"{name:20} {_format(first['median']):>15} {_format(first['p90']):>12} {_format(n['median']):>15} {_format(n['p90']):>12} {n['reached']:>4}/{n['runs']:<3}")
+    return results
+
+def _format(value):
+    return "-" if value is None else f"{value:.0f}"
@@ -0,0 +1,162 @@
+import math
+
+"""
+    Sequential tests to stop repeating a glitch parameter point as soon as its
+    success probability is known to be above or below a threshold, instead of
+    always spending a fixed number of attempts on it.
+"""
+
+ABOVE = "above"
+BELOW = "below"
+UNDECIDED = "undecided"
+
+class SequentialTester:
+    """
+    Decides after every attempt whether the success probability of a point is
+    above or below threshold, or whether more attempts are needed.
+
+    Example::
+
+        tester = SequentialTester(threshold=0.05, max_attempts=50)
+        for delay, pulse in points:
+            def attempt():
+                f.glitch(delay, pulse)
+                return "success" if f.swd_check() else "nothing"
+            tester.run(attempt, delay, pulse, gdc=gdc)
+        # gdc.point_estimates now holds the estimate and decision of every point.
+
+    :param threshold: The success probability to test against.
+
+    :param max_attempts: Attempts after which a point is given up as UNDECIDED.
+
+    :param min_attempts: Attempts before any decision is made.
+
+    :param confidence: 1 - the error rate the test aims for, i.e. 0.95. See method
+                       for what is guaranteed. The decision is checked after every
+                       attempt, which each method accounts for.
+
+    :param method: "sprt" runs Wald's sequential probability ratio test of p0 against
+                   p1. Its error rates hold (approximately) at p0 and p1; a point whose
+                   rate lies between them may be decided either way. It needs few
+                   attempts on average. "binomial" runs an exact binomial test against
+                   threshold after every attempt, with the error split evenly across
+                   all attempts up to max_attempts, so the error rate holds for any
+                   rate on the wrong side of threshold. It needs more attempts and
+                   leaves more points UNDECIDED.
+
+    :param p0: The "dead" success rate for "sprt", defaults to threshold / 2.
+
+    :param p1: The "alive" success rate for "sprt", defaults to 2 * threshold (at most halfway to 1).
+    """
+    def __init__(self, threshold, max_attempts=100, min_attempts=1, confidence=0.95, method="sprt", p0=None, p1=None):
+        if not 0 < threshold < 1:
+            raise ValueError(f"Threshold must be between 0 and 1. Provided {threshold}.")
+        if method not in ("sprt", "binomial"):
+            raise ValueError(f"Unknown method {method}, use sprt or binomial.")
+        self.threshold = threshold
+        self.max_attempts = max_attempts
+        self.min_attempts = min_attempts
+        self.confidence = confidence
+        self.method = method
+        self.p0 = threshold / 2 if p0 is None else p0
+        self.p1 = min(2 * threshold, (1 + threshold) / 2) if p1 is None else p1
+        if not 0 < self.p0 < self.p1 < 1:
+            raise ValueError("SPRT rates must satisfy 0 < p0 < p1 < 1.")
+        error = 1 - confidence
+        self._log_success = math.log(self.p1 / self.p0)
+        self._log_failure = math.log((1 - self.p1) / (1 - self.p0))
+        self._upper = math.log((1 - error) / error)
+        self._lower = math.log(error / (1 - error))
+        # Error per attempt of the binomial test (Bonferroni over all looks), and
+        # attempts -> (most successes still BELOW, fewest successes ABOVE).
+        self._look_error = error / max(max_attempts - min_attempts + 1, 1)
+        self._limits = {}
+
+    def _log_pmf(self, k, n):
+        p = self.threshold
+        return (math.lgamma(n + 1) - math.lgamma(k + 1) - math.lgamma(n - k + 1)
+                + k * math.log(p) + (n - k) * math.log(1 - p))
+
+    def limits(self, attempts):
+        """
+        Returns (below, above) for the binomial test: after attempts attempts, at most
+        below successes decide BELOW and at least above successes decide ABOVE.
+        below is -1 if no number of successes decides BELOW yet.
+        """
+        if attempts not in self._limits:
+            pmf = [math.exp(self._log_pmf(k, attempts)) for k in range(attempts + 1)]
+            below = -1
+            tail = 0.0
+            for k in range(attempts + 1):
+                tail += pmf[k]
+                if tail > self._look_error:
+                    break
+                below = k
+            above = attempts + 1
+            tail = 0.0
+            for k in range(attempts, -1, -1):
+                tail += pmf[k]
+                if tail > self._look_error:
+                    break
+                above = k
+            self._limits[attempts] = (below, above)
+        return self._limits[attempts]
+
+    def decide(self, successes, attempts):
+        """
+        Returns ABOVE or BELOW once the test is decided, UNDECIDED once max_attempts
+        are reached without a decision, and None if more attempts are needed.
+        """
+        if attempts >= self.min_attempts:
+            if self.method == "binomial":
+                below, above = self.limits(attempts)
+                if successes <= below:
+                    return BELOW
+                if successes >= above:
+                    return ABOVE
+            else:
+                ratio = successes * self._log_success + (attempts - successes) * self._log_failure
+                if ratio >= self._upper:
+                    return ABOVE
+                if ratio <= self._lower:
+                    return BELOW
+        if attempts >= self.max_attempts:
+            return UNDECIDED
+        return None
+
+    def run(self, attempt, delay=None, pulse=None, gdc=None, success_keys=("success",), failure_key="nothing"):
+        """
+        Calls attempt() until the point is decided and returns (decision, successes, attempts).
+
+        :param attempt: Performs one glitch and returns either whether it succeeded,
+                        or the GlitchDataCollection key of the outcome.
+
+        :param gdc: If given, every outcome key is added to it as point (delay, pulse)
+                    and the final estimate is recorded with record_estimate().
+                    delay and pulse are required then.
+
+        :param success_keys: The keys that count as success when attempt returns keys.
+                             A True result is added to gdc under the first one.
+
+        :param failure_key: The key a False result is added to gdc under.
+        """
+        if gdc is not None and (delay is None or pulse is None):
+            raise ValueError("delay and pulse are required to record the outcomes in gdc.")
+        successes = 0
+        attempts = 0
+        while True:
+            result = attempt()
+            attempts += 1
+            if isinstance(result, bool):
+                successes += result
+                result = success_keys[0] if result else failure_key
+            else:
+                successes += result in success_keys
+            if gdc is not None:
+                gdc.add(result, delay, pulse)
+            decision = self.decide(successes, attempts)
+            if decision is not None:
+                break
+        if gdc is not None:
+            gdc.record_estimate(delay, pulse, successes, attempts, decision)
+        return decision, successes, attempts
@@ -0,0 +1,237 @@
+import json
+import os
+import struct
+import time
+import numpy as np
+
+"""
+    An append-only archive of ADC traces. Every trace is stored together with
+    its delay, pulse and outcome in a fixed-width record of a preallocated,
+    memory-mapped file. Archives with millions of traces load instantly and
+    do not have to fit into memory.
+
+    File layout: A 4096 byte header (magic, version, sample count, capacity,
+    record count and a JSON block with the outcome names and user metadata),
+    followed by capacity fixed-width records.
+"""
+
+MAGIC = b"FLTTRACE"
+VERSION = 1
+HEADER_SIZE = 4096
+# magic, version, sample_count, capacity, count, metadata length
+HEADER_FORMAT = "<8sIIQQI"
+COUNT_OFFSET = 24
+
+def record_dtype(sample_count):
+    """
+    The numpy dtype of a single record in an archive with sample_count samples per trace.
+    """
+    return np.dtype([
+        ("delay", "<i4"),
+        ("pulse", "<i4"),
+        ("outcome", "<i2"),
+        ("length", "<u2"),
+        ("timestamp", "<f8"),
+        ("samples", "u1", (sample_count,)),
+    ])
+
+class TraceArchive:
+    """
+    Opens or creates a trace archive.
+
+    Example::
+
+        archive = TraceArchive("traces.bin", sample_count=30000)
+        f.glitch(delay, pulse)
+        archive.append(f.read_adc(), delay, pulse, "success")
+
+        # Later, i.e. in another notebook:
+        archive = TraceArchive.load("traces.bin")
+        successes = archive.samples[archive.outcomes == archive.outcome_code("success")]
+
+    :param path: The file to store the archive in. If it exists, new traces are appended.
+
+    :param sample_count: The maximum number of samples per trace. Shorter traces are
+                         zero-padded. Ignored when opening an existing archive.
+
+    :param capacity: The number of records to preallocate. The file grows by doubling
+                     when it runs full.
+
+    :param readonly: Open an existing archive without allowing appends.
+    """
+    def __init__(self, path, sample_count = 30000, capacity = 65536, readonly = False):
+        self.path = path
+        self.readonly = readonly
+        if os.path.exists(path):
+            self._read_header()
+        else:
+            if readonly:
+                raise FileNotFoundError(f"Trace archive {path} not found.")
+            if sample_count < 1 or sample_count > 65535:
+                raise ValueError(f"Sample count must be between 1 and 65535. Provided {sample_count}.")
+            self.sample_count = sample_count
+            self.capacity = max(capacity, 1)
+            self.count = 0
+            self.outcome_names = []
+            self.metadata = {}
+            self.dtype = record_dtype(self.sample_count)
+            with open(path, "wb") as f:
+                f.truncate(HEADER_SIZE + self.capacity * self.dtype.itemsize)
+            self._write_header()
+        self._map()
+
+    @staticmethod
+    def load(path):
+        """
+        Opens an existing archive read-only.
+        """
+        return TraceArchive(path, readonly=True)
+
+    def _read_header(self):
+        with open(self.path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        magic, version, sample_count, capacity, count, metadata_length = struct.unpack_from(HEADER_FORMAT, header)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a trace archive.")
+        if version != VERSION:
+            raise ValueError(f"Unsupported trace archive version {version}.")
+        metadata_offset = struct.calcsize(HEADER_FORMAT)
+        metadata = json.loads(header[metadata_offset:metadata_offset + metadata_length].decode("utf-8"))
+        self.sample_count = sample_count
+        self.capacity = capacity
+        self.count = count
+        self.outcome_names = metadata["outcomes"]
+        self.metadata = metadata["metadata"]
+        self.dtype = record_dtype(sample_count)
+
+    def _write_header(self):
+        metadata = json.dumps({"outcomes": self.outcome_names, "metadata": self.metadata}).encode("utf-8")
+        if struct.calcsize(HEADER_FORMAT) + len(metadata) > HEADER_SIZE:
+            raise ValueError("Trace archive metadata too large.")
+        header = struct.pack(HEADER_FORMAT, MAGIC, VERSION, self.sample_count, self.capacity, self.count, len(metadata)) + metadata
+        with open(self.path, "r+b") as f:
+            f.write(header)
+
+    def _map(self):
+        mode = "r" if self.readonly else "r+"
+        self._header = None if self.readonly else np.memmap(self.path, dtype=np.uint8, mode=mode, shape=(HEADER_SIZE,))
+        self._records = np.memmap(self.path, dtype=self.dtype, mode=mode, offset=HEADER_SIZE, shape=(self.capacity,))
+
+    def _grow(self):
+        self.flush()
+        self._header = None
+        self._records = None
+        self.capacity *= 2
+        with open(self.path, "r+b") as f:
+            f.truncate(HEADER_SIZE + self.capacity * self.dtype.itemsize)
+        self._write_header()
+        self._map()
+
+    def outcome_code(self, outcome):
+        """
+        Returns the integer code an outcome name is stored as, registering it if it is new.
+        """
+        if outcome not in self.outcome_names:
+            if self.readonly:
+                raise KeyError(f"Unknown outcome {outcome}.")
+            self.outcome_names.append(outcome)
+            self._write_header()
+        return self.outcome_names.index(outcome)
+
+    def append(self, samples, delay, pulse, outcome, timestamp = None):
+        """
+        Appends a trace.
+
+        :param samples: The samples as returned by read_adc(), as uint8 array, bytes or
+                        integers. Scaled floats (0..1) are converted back to raw samples.
+
+        :param outcome: Either a name (i.e. the GlitchDataCollection key) or an integer code.
+        """
+        if self.readonly:
+            raise ValueError("Trace archive is opened read-only.")
+        if isinstance(samples, (bytes, bytearray, memoryview)):
+            samples = np.frombuffer(samples, dtype=np.uint8)
+        else:
+            samples = np.asarray(samples)
+        if np.issubdtype(samples.dtype, np.floating):
+            samples = np.clip(np.rint(samples * 255), 0, 255).astype(np.uint8)
+        elif samples.dtype != np.uint8:
+            samples = np.clip(samples, 0, 255).astype(np.uint8)
+        length = min(len(samples), self.sample_count)
+        if isinstance(outcome, str):
+            outcome = self.outcome_code(outcome)
+        if self.count >= self.capacity:
+            self._grow()
+
+        record = self._records[self.count]
+        record["delay"] = delay
+        record["pulse"] = pulse
+        record["outcome"] = outcome
+        record["length"] = length
+        record["timestamp"] = time.time() if timestamp is None else timestamp
+        record["samples"][:length] = samples[:length]
+        record["samples"][length:] = 0
+        self.count += 1
+        struct.pack_into("<Q", self._header, COUNT_OFFSET, self.count)
+
+    def truncate(self, count):
+        """
+        Drops all traces from index count on, i.e. to go back to a checkpoint.
+        """
+        if self.readonly:
+            raise ValueError("Trace archive is opened read-only.")
+        if count < self.count:
+            self.count = max(count, 0)
+            struct.pack_into("<Q", self._header, COUNT_OFFSET, self.count)
+
+    def flush(self):
+        """
+        Writes all changes to disk.
+        """
+        if self.readonly:
+            return
+        self._records.flush()
+        self._header.flush()
+
+    def close(self):
+        self.flush()
+        self._header = None
+        self._records = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        return self.records[index]
+
+    @property
+    def records(self):
+        """
+        All records as memory-mapped numpy structured array.
+        """
+        return self._records[:self.count]
+
+    @property
+    def samples(self):
+        """
+        All traces as (count, sample_count) uint8 array.
+        """
+        return self.records["samples"]
+
+    @property
+    def delays(self):
+        return self.records["delay"]
+
+    @property
+    def pulses(self):
+        return self.records["pulse"]
+
+    @property
+    def outcomes(self):
+        return self.records["outcome"]
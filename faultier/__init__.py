@@ -1,6 +1,103 @@
 from .Faultier import *
-from .FaulterVis import *
-from .LivePlot import *
-from .RandomOrderGenerator import RandomOrderGenerator
-from .GlitchDataCollection import GlitchDataCollection
-from .FaultierTool import *
+
+# Everything besides the control path is imported on first use, so that
+# `import faultier`, the command line tool and pool workers do not pay for
+# plotly, matplotlib, IPython or numpy unless they use them.
+# Attribute name -> module it lives in.
+_LAZY = {
+    "AsyncFaultier": ".AsyncFaultier",
+    "FaultierPool": ".FaultierPool",
+    "FaultierVis": ".FaulterVis",
+    "update_text_fill": ".FaulterVis",
+    "LivePlot": ".LivePlot",
+    "LiveMarkerPlot": ".LivePlot",
+    "LiveMarkerPlotOld": ".LivePlot",
+    "minmax_downsample": ".LivePlot",
+    "update_vline_position": ".LivePlot",
+    "BackgroundPlotter": ".BackgroundPlotter",
+    "RandomOrderGenerator": ".RandomOrderGenerator",
+    "ParameterSampler": ".ParameterSampler",
+    "AdaptiveSearch": ".AdaptiveSearch",
+    "SequentialTester": ".SequentialTester",
+    "GlitchDataCollection": ".GlitchDataCollection",
+    "TraceArchive": ".TraceArchive",
+    "OpenOCDSession": ".OpenOCDSession",
+    "OpenOCDError": ".OpenOCDSession",
+    "HexImage": ".IntelHex",
+    "main": ".FaultierTool",
+    "openocd_program": ".FaultierTool",
+    "faultier_nrf52_test": ".FaultierTool",
+    "faultier_nrf52_flash": ".FaultierTool",
+    "faultier_nrf52_lock": ".FaultierTool",
+    "faultier_nrf52_unlock": ".FaultierTool",
+    "faultier_stm32_test": ".FaultierTool",
+    "faultier_stm32_rdp0": ".FaultierTool",
+    "faultier_stm32_rdp1": ".FaultierTool",
+    "faultier_stm32_rdp2": ".FaultierTool",
+    "faultier_stm32_flash": ".FaultierTool",
+    "faultier_test": ".FaultierTool",
+    "faultier_campaign": ".FaultierTool",
+    # Star-exported by the eager imports of older versions.
+    "display": "IPython.display",
+    "HTML": "IPython.display",
+}
+
+# Name -> module that is itself the attribute.
+_LAZY_MODULES = {
+    "FaulterVis": ".FaulterVis",
+    "FaultierTool": ".FaultierTool",
+    # Star-exported by the eager imports of older versions.
+    "faultier": __name__,
+    "go": "plotly.graph_objs",
+    "ET": "xml.etree.ElementTree",
+    "argparse": "argparse",
+    "tempfile": "tempfile",
+    "time": "time",
+    "urllib": "urllib",
+}
+
+def __getattr__(name):
+    import importlib
+    if name in _LAZY_MODULES:
+        value = importlib.import_module(_LAZY_MODULES[name], __name__)
+    elif name in _LAZY:
+        value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # Importing a submodule binds it on the package, i.e. faultier.LivePlot.
+    # Binding the value afterwards keeps the class of the same name, like the
+    # eager imports did. A submodule that is imported directly before its class
+    # was first used here stays bound as module, which is why the modules of
+    # this package import such classes through the package.
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+__all__ = [
+    # Control path, see Faultier.py.
+    "Faultier", "FaultierDevice", "find_faultier", "find_faultiers", "ResponseFuture",
+    "TriggerTimeout", "ConfigurationRejected", "IOStats", "convert_uint8_samples",
+    "scale_adc_samples", "FAULTIER_VID", "FAULTIER_PID", "MODULE_DIR",
+    # Protocol, see faultier_pb2.py.
+    "faultier_pb2", "DESCRIPTOR", "FaultierVersion", "FAULTIER_VERSION_ZERO", "FAULTIER_VERSION",
+    "Commands", "CMD_RESET", "CMD_GLITCH", "CMD_CAPTURE",
+    "TriggerSource", "TRIGGER_IN_NONE", "TRIGGER_IN_EXT0", "TRIGGER_IN_EXT1",
+    "GlitchOutput", "OUT_CROWBAR", "OUT_MUX0", "OUT_MUX1", "OUT_MUX2", "OUT_EXT0", "OUT_EXT1", "OUT_NONE",
+    "TriggersType", "TRIGGER_NONE", "TRIGGER_HIGH", "TRIGGER_LOW", "TRIGGER_RISING_EDGE",
+    "TRIGGER_FALLING_EDGE", "TRIGGER_PULSE_POSITIVE", "TRIGGER_PULSE_NEGATIVE",
+    "ADCSource", "ADC_CROWBAR", "ADC_MUX0", "ADC_EXT1",
+    "AuxFunction", "AUX_NONE", "AUX_UART", "AUX_SWD_CHECKER", "AUX_SWD_PROBE",
+    "SWDCheckFunction", "SWD_CHECK_ENABLED", "SWD_CHECK_NRF52",
+    "TriggerPullConfiguration", "TRIGGER_PULL_NONE", "TRIGGER_PULL_UP", "TRIGGER_PULL_DOWN",
+    "CaptureResponse", "CommandHello", "CommandCapture", "CommandGlitch", "CommandSWDCheck",
+    "CommandConfigureGlitcher", "CommandConfigureADC", "CommandReadADC", "Command",
+    "ResponseOk", "ResponseError", "ResponseHello", "ResponseTriggerTimeout", "ResponseADC",
+    "ResponseInfo", "ResponseSWDCheck", "Response",
+    # Modules star-exported by older versions.
+    "os", "platform", "serial", "struct", "subprocess", "sys",
+    # Lazily imported, see above.
+    *_LAZY,
+    *_LAZY_MODULES,
+]
@@ -0,0 +1,125 @@
+import re
+import socket
+import threading
+
+import pytest
+
+from faultier.OpenOCDSession import OpenOCDSession, OpenOCDError, TCL_TERMINATOR
+
+CAPTURE = re.compile(r"set _faultier_rc \[catch \{capture \{(.*)\}\} _faultier_out\]")
+
+class FakeOpenOCD:
+    """
+    Minimal stand-in for the Tcl RPC server of OpenOCD with an nRF52 attached.
+    Knows the commands OpenOCDSession sends and which image is in flash.
+    """
+    def __init__(self):
+        self.locked = False
+        self.flash = None
+        self.commands = []
+        self.server = socket.socket()
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen(1)
+        self.port = self.server.getsockname()[1]
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+
+    def _serve(self):
+        conn, _ = self.server.accept()
+        buffer = b""
+        with conn:
+            while True:
+                data = conn.recv(4096)
+                if not data:
+                    return
+                buffer += data
+                while TCL_TERMINATOR in buffer:
+                    command, buffer = buffer.split(TCL_TERMINATOR, 1)
+                    conn.sendall(self.respond(command.decode()).encode() + TCL_TERMINATOR)
+
+    def respond(self, command):
+        match = CAPTURE.match(command)
+        if match is None:
+            return ""
+        command = match.group(1)
+        self.commands.append(command)
+        path = command.split("{")[1].split("}")[0] if "{" in command else None
+        if command == "nrf52.dap apreg 1 0x0c":
+            return "0 " + ("0x00000000" if self.locked else "0x00000001")
+        if command == "nrf52_recover":
+            self.locked = False
+            self.flash = None
+            return "0 Device unlocked"
+        if command.startswith("program "):
+            if "broken" in path:
+                return "0 ** Programming Finished **\n** Verify Failed **"
+            self.flash = path
+            return "0 ** Programming Finished **\n** Verified OK **"
+        if command.startswith("verify_image_checksum "):
+            if self.locked:
+                return "1 Failed to read memory"
+            if self.flash != path:
+                return "0 checksum mismatch - attempting binary compare"
+            return "0 verified 4 bytes"
+        if command.startswith("flash fillw 0x10001208"):
+            self.locked = True
+            return "0 "
+        if command == "reset" or command.startswith("nrf52.dap apreg 1 0x000"):
+            return "0 "
+        return f"1 invalid command name \"{command.split()[0]}\""
+
+def write_hex(path, data):
+    record = bytes([len(data), 0, 0, 0]) + data
+    record += bytes([-sum(record) & 0xFF])
+    path.write_text(f":{record.hex().upper()}\n:00000001FF\n")
+    return str(path)
+
+@pytest.fixture
+def fake():
+    return FakeOpenOCD()
+
+@pytest.fixture
+def session(fake):
+    with OpenOCDSession(port=fake.port, spawn=False, startup_timeout=5) as session:
+        yield session
+
+def test_program(fake, session, tmp_path):
+    image = write_hex(tmp_path / "a.hex", b"\x01\x02\x03\x04")
+    output = session.program(image, recover=True)
+    assert "Verified OK" in output
+    assert fake.commands == ["nrf52_recover", f"program {{{image}}} verify", "reset"]
+    assert fake.flash == image
+    assert session.programmed is not None
+
+def test_program_verify_failure(fake, session, tmp_path):
+    image = write_hex(tmp_path / "broken.hex", b"\x01\x02\x03\x04")
+    with pytest.raises(OpenOCDError):
+        session.program(image)
+    assert session.programmed is None
+    assert "reset" not in fake.commands
+
+def test_image_unchanged_unlocked(session, tmp_path):
+    first = write_hex(tmp_path / "a.hex", b"\x01\x02\x03\x04")
+    second = write_hex(tmp_path / "b.hex", b"\x05\x06\x07\x08")
+    session.program(first)
+    assert session.image_unchanged(first)
+    assert not session.image_unchanged(second)
+
+def test_image_unchanged_locked(session, tmp_path):
+    first = write_hex(tmp_path / "a.hex", b"\x01\x02\x03\x04")
+    copy = write_hex(tmp_path / "copy.hex", b"\x01\x02\x03\x04")
+    second = write_hex(tmp_path / "b.hex", b"\x05\x06\x07\x08")
+    session.program(first)
+    session.lock_nrf()
+    assert session.check_nrf_lock()
+    # A locked chip cannot be read, the digest of the programmed image decides.
+    assert session.image_unchanged(copy)
+    assert not session.image_unchanged(second)
+    session.unlock_nrf()
+    assert not session.image_unchanged(first, locked=True)
+
+def test_error_propagation(session):
+    with pytest.raises(OpenOCDError, match="invalid command name"):
+        session.capture("bogus")
+    # The session stays in sync after a failed command.
+    assert session.check_nrf_lock() is False